@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Hashable, Optional
+import telemetry
+
+# Admission control in front of the chat model. Azure enforces a deployment's
+# requests-per-minute and tokens-per-minute quota, counting each request as
+# its prompt tokens plus max_tokens, over windows of a few seconds. Requests
+# are admitted only while two token buckets mirroring that quota have room.
+# Others wait in a bounded queue served round-robin across sessions, so one
+# busy session cannot starve the rest, and are shed once they have waited
+# too long.
+
+# The deployment's quota. Azure grants 6 requests per minute for every 1000 tokens per minute.
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", str(LLM_TOKENS_PER_MINUTE * 6 // 1000)))
+
+# Requests beyond ADMISSION_MAX_QUEUE waiting, or waiting longer than ADMISSION_MAX_WAIT_SECONDS, are shed
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+
+# Buckets hold this many seconds of quota, matching how briefly Azure lets a burst run ahead
+BURST_SECONDS = 10
+
+# A waiting request re-checks the buckets and its queue position at least this often
+POLL_INTERVAL = 0.5
+
+
+class Overloaded(Exception):
+    """The request was shed instead of being sent to the chat model"""
+
+
+class QueueFull(Overloaded):
+    """Too many requests are already waiting"""
+
+
+class WaitDeadlineExceeded(Overloaded):
+    """The request waited longer than the admission deadline"""
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to capacity.
+
+    Takes are charged in full, so a request larger than the capacity drives
+    the level below zero and later requests wait until that debt is repaid.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute * BURST_SECONDS / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_seconds(self, amount: float, now: float) -> float:
+        """Seconds until amount may be taken; more than capacity only needs a full bucket"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class _Waiter:
+    def __init__(self, session_id: Hashable, tokens: int):
+        self.session_id = session_id
+        self.tokens = tokens
+
+
+class AdmissionController:
+    """Requests-per-minute and tokens-per-minute buckets with a fair, bounded wait queue"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_queue: int = 50,
+                 max_wait_seconds: float = 30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._condition = threading.Condition()
+        # Waiting requests per session; sessions are served in this order, then rotated to the back
+        self._queues: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._waiting = 0
+        self._stats = {"admitted": 0, "queued": 0, "queue_full": 0, "timed_out": 0}
+
+    def _position(self, waiter: _Waiter) -> int:
+        """Requests ahead of waiter in round-robin order across sessions"""
+        index = self._queues[waiter.session_id].index(waiter)
+        ahead, before = 0, True
+        for session_id, queue in self._queues.items():
+            if session_id == waiter.session_id:
+                ahead += index
+                before = False
+            else:
+                ahead += min(len(queue), index + 1 if before else index)
+        return ahead
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues[waiter.session_id]
+        queue.remove(waiter)
+        if queue:
+            # The session was served; its next request waits behind the other sessions
+            self._queues.move_to_end(waiter.session_id)
+        else:
+            del self._queues[waiter.session_id]
+        self._waiting -= 1
+        self._condition.notify_all()
+
+    def acquire(self, session_id: Hashable, tokens: int,
+                on_queue: Optional[Callable[[Optional[int]], None]] = None) -> float:
+        """Block until a request costing tokens may be sent; returns the seconds waited.
+
+        on_queue, if given, is called with the number of requests ahead
+        whenever it changes while waiting, and with None once the request
+        leaves the queue. It runs outside the lock, so a slow UI update holds
+        up only its own request. Raises QueueFull or WaitDeadlineExceeded when
+        the request is shed.
+        """
+        start = time.monotonic()
+        deadline = start + self.max_wait_seconds
+        waiter = _Waiter(session_id, tokens)
+        with self._condition:
+            if self._waiting >= self.max_queue:
+                self._stats["queue_full"] += 1
+                telemetry.metrics.inc("constitution_admission_total", outcome="queue_full")
+                raise QueueFull(f"{self._waiting} requests are already waiting for the chat model")
+            self._queues.setdefault(session_id, deque()).append(waiter)
+            self._waiting += 1
+
+        last_position, queued = None, False
+        try:
+            while True:
+                with self._condition:
+                    now = time.monotonic()
+                    position = self._position(waiter)
+                    if position == 0:
+                        wait = max(self.requests.wait_seconds(1, now), self.tokens.wait_seconds(tokens, now))
+                        if wait == 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            self._stats["admitted"] += 1
+                            break
+                    else:
+                        wait = POLL_INTERVAL
+                    if now >= deadline:
+                        self._stats["timed_out"] += 1
+                        telemetry.metrics.inc("constitution_admission_total", outcome="timed_out")
+                        raise WaitDeadlineExceeded(
+                            f"Waited {now - start:.1f}s for the chat model quota; giving up"
+                        )
+                    if not queued:
+                        queued = True
+                        self._stats["queued"] += 1
+                    if on_queue is None or position == last_position:
+                        self._condition.wait(min(wait, POLL_INTERVAL, max(deadline - now, 0.0)))
+                        continue
+                # Position changed: report it with the lock released, then check again
+                on_queue(position)
+                last_position = position
+        finally:
+            with self._condition:
+                self._remove(waiter)
+
+        waited = time.monotonic() - start
+        if on_queue is not None and queued:
+            on_queue(None)
+        telemetry.metrics.inc("constitution_admission_total", outcome="admitted")
+        telemetry.metrics.observe("constitution_admission_wait_seconds", waited)
+        return waited
+
+    def stats(self) -> dict:
+        """Admission outcome counts and the number of requests waiting now"""
+        with self._condition:
+            return dict(self._stats, waiting=self._waiting, sessions_waiting=len(self._queues))
@@ -0,0 +1,132 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, List
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Answer cache matched on query embedding similarity.
+
+    Entries are stored in a SQLite file so the cache survives restarts and is
+    shared by every session and worker process on the host. Each namespace
+    (one per collection, prompt version and index build) is matched
+    separately. A hit also needs the same fingerprint: the exact Articles,
+    Amendments and other numbers the question names, which embeddings barely
+    tell apart. Entries
+    expire after ttl_seconds, and once max_entries is exceeded the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = "./.cache/answer_cache.sqlite3", similarity_threshold: float = 0.92,
+                 max_entries: int = 2000, ttl_seconds: int = 7 * 24 * 3600):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL DEFAULT '',
+                    embedding BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(answers)")}
+            if "fingerprint" not in columns:
+                # Caches written before fingerprints existed
+                conn.execute("ALTER TABLE answers ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_lookup ON answers (namespace, fingerprint)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace: str, embedding: List[float], fingerprint: str = "") -> Optional[str]:
+        """Return the cached answer with this fingerprint most similar to embedding, if above the threshold"""
+        try:
+            now = time.time()
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT id, embedding, answer FROM answers WHERE namespace = ? AND fingerprint = ? AND created_at > ?",
+                (namespace, fingerprint, now - self.ttl_seconds)
+            ).fetchall()
+            if not rows:
+                self.misses += 1
+                return None
+
+            matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            similarities = matrix @ self._normalize(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            with conn:
+                conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (now, rows[best][0]))
+            self.hits += 1
+            return rows[best][2]
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Error reading answer cache: {str(e)}")
+            self.misses += 1
+            return None
+
+    def store(self, namespace: str, question: str, embedding: List[float], answer: str, fingerprint: str = ""):
+        """Add an answer to the cache and evict expired or least recently used entries"""
+        try:
+            now = time.time()
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO answers (namespace, question, fingerprint, embedding, answer, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, question, fingerprint, self._normalize(embedding).tobytes(), answer, now, now)
+                )
+                conn.execute("DELETE FROM answers WHERE created_at <= ?", (now - self.ttl_seconds,))
+                conn.execute(
+                    "DELETE FROM answers WHERE id IN ("
+                    "SELECT id FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Error writing answer cache: {str(e)}")
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove all entries, or only those of one namespace"""
+        conn = self._connection()
+        with conn:
+            if namespace is None:
+                conn.execute("DELETE FROM answers")
+            else:
+                conn.execute("DELETE FROM answers WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for this process and the number of stored entries"""
+        (entries,) = self._connection().execute("SELECT COUNT(*) FROM answers").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import subprocess
+from typing import Callable, Iterable, List, Optional, Tuple
+import numpy as np
+import resources
+from faq import constitution_faq, amendment_faq
+from stub_llm_server import StubLLMServer
+
+# Latency and throughput benchmarks for ingestion, query embedding, vector
+# search and end-to-end answering. Answers come from StubLLMServer, so the
+# numbers measure this app rather than Azure. Results are saved per commit
+# under RESULTS_DIR and compared with the previous run.
+#
+#   python src/benchmark.py
+#   python src/benchmark.py --stages search,e2e --baseline benchmark_results/<file>.json
+
+RESULTS_DIR = "./benchmark_results"
+STAGES = ("ingestion", "embedding", "search", "e2e")
+
+# p95 latency or throughput this much worse than the baseline counts as a regression
+REGRESSION_TOLERANCE = 0.10
+
+# Rewrites used to turn each FAQ question into paraphrases that miss exact-match caches
+PARAPHRASE_TEMPLATES = (
+    "Can you explain {lower}",
+    "Please tell me: {question}",
+    "In simple terms, {lower}",
+    "{stripped}? Explain briefly.",
+    "I'd like to know {lower}",
+    "Quick question: {lower}",
+    "{stripped}, according to the Constitution?",
+)
+
+
+def faq_workload() -> List[str]:
+    return constitution_faq + amendment_faq
+
+
+def paraphrase_workload(questions: List[str], per_question: int = 3, seed: int = 0) -> List[str]:
+    """Deterministic paraphrases of each question built from PARAPHRASE_TEMPLATES"""
+    rng = random.Random(seed)
+    paraphrases = []
+    for question in questions:
+        fields = {
+            "question": question,
+            "lower": question[0].lower() + question[1:],
+            "stripped": question.rstrip("?"),
+        }
+        for template in rng.sample(PARAPHRASE_TEMPLATES, min(per_question, len(PARAPHRASE_TEMPLATES))):
+            paraphrases.append(template.format(**fields))
+    return paraphrases
+
+
+def summarize(latencies: List[float], wall_seconds: float, items: Optional[int] = None) -> dict:
+    """Percentiles in milliseconds and throughput in items per second"""
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000
+    items = len(latencies) if items is None else items
+    return {
+        "count": len(latencies),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+        "throughput_per_s": items / wall_seconds if wall_seconds else 0.0,
+    }
+
+
+def run_timed(operation: Callable, inputs: Iterable) -> Tuple[List[float], float]:
+    """Call operation on each input sequentially; returns per-call latencies and wall time"""
+    latencies = []
+    began = time.perf_counter()
+    for item in inputs:
+        start = time.perf_counter()
+        operation(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.perf_counter() - began
+
+
+def bench_ingestion(pdf_path: str, max_chunks: int = 300, batch_size: int = 64) -> dict:
+    """Chunking latency per emitted chunk and embedding latency per batch for one PDF"""
+    from chroma import iter_pdf_chunks
+    from embedding_utils import EmbeddingStage
+
+    chunks, latencies = [], []
+    began = time.perf_counter()
+    start = began
+    for chunk in iter_pdf_chunks(pdf_path):
+        now = time.perf_counter()
+        latencies.append(now - start)
+        chunks.append(chunk)
+        start = now
+        if len(chunks) >= max_chunks:
+            break
+    chunking = summarize(latencies, time.perf_counter() - began)
+
+    stage = EmbeddingStage(model_name=resources.EMBEDDING_MODEL, batch_size=batch_size)
+    try:
+        texts = [text for text, _ in chunks]
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        batch_latencies, wall = run_timed(stage.encode, batches)
+    finally:
+        stage.close()
+    embedding = summarize(batch_latencies, wall, items=len(texts))
+    return {"ingestion_chunking": chunking, "ingestion_embedding": embedding}
+
+
+def bench_query_embedding(queries: List[str]) -> dict:
+    """Model cost of embedding one query, bypassing the query embedding cache"""
+    embedding_function = resources.get_embedding_function()
+    embedding_function(queries[:2])  # warm up
+    return {"query_embedding": summarize(*run_timed(lambda query: embedding_function([query]), queries))}
+
+
+def bench_vector_search(queries: List[str], language: str, n_results: int = 5) -> dict:
+    """Search latency with precomputed embeddings, one query at a time and batched"""
+    from response_utils import retrieval_target
+
+    chroma_client = resources.get_chroma_client()
+    collection_name, where = retrieval_target(language)
+    embeddings = chroma_client.embed_queries(queries)
+    chroma_client.query_collection(collection_name, queries[0], n_results, embeddings[0], where)  # warm up
+
+    single = summarize(*run_timed(
+        lambda i: chroma_client.query_collection(collection_name, queries[i], n_results, embeddings[i], where),
+        range(len(queries))
+    ))
+    start = time.perf_counter()
+    chroma_client.query_collection_many(collection_name, queries, n_results, where, query_embeddings=embeddings)
+    batch_seconds = time.perf_counter() - start
+    return {"vector_search": single,
+            "vector_search_batched": summarize([batch_seconds], batch_seconds, items=len(queries))}
+
+
+def bench_end_to_end(queries: List[str], language: str) -> dict:
+    """generate_response and stream_response latency against the stub LLM, answer cache and admission control off"""
+    import response_utils
+
+    response_utils.ANSWER_CACHE_ENABLED = False
+    # The limiter's waits for the Azure quota would swamp the latency being measured
+    response_utils.ADMISSION_CONTROL = False
+    response_utils.generate_response(queries[0], language)  # warm up
+
+    answers = []
+    complete = summarize(*run_timed(
+        lambda query: answers.append(response_utils.generate_response(query, language)), queries
+    ))
+    errors = sum(answer.startswith("An error occurred") or answer == response_utils.BUSY_MESSAGE for answer in answers)
+
+    first_tokens = []
+
+    def stream(query):
+        timings = {}
+        for _ in response_utils.stream_response(query, language, timings):
+            pass
+        first_tokens.append(timings.get("time_to_first_token", timings["total_latency"]))
+
+    streamed = summarize(*run_timed(stream, queries))
+    return {
+        "e2e_generate": dict(complete, errors=errors),
+        "e2e_stream_total": streamed,
+        "e2e_stream_first_token": summarize(first_tokens, sum(first_tokens)),
+    }
+
+
+def git_revision() -> dict:
+    """Commit the benchmark ran on and whether the tree had local changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": False}
+
+
+def save_results(report: dict, results_dir: str = RESULTS_DIR) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    revision = report["revision"]
+    name = f"{report['started_at'].replace(':', '').replace('-', '')}-{revision['commit']}"
+    path = os.path.join(results_dir, f"{name}{'-dirty' if revision['dirty'] else ''}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def latest_results(results_dir: str = RESULTS_DIR, exclude: Optional[str] = None) -> Optional[str]:
+    """Most recent saved result file, which serves as the default baseline"""
+    try:
+        paths = sorted(os.path.join(results_dir, name) for name in os.listdir(results_dir) if name.endswith(".json"))
+    except FileNotFoundError:
+        return None
+    paths = [path for path in paths if path != exclude]
+    return paths[-1] if paths else None
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE) -> List[str]:
+    """Benchmarks whose p95 latency rose or throughput fell by more than tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not current.get("count") or not previous.get("count"):
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if current["throughput_per_s"] < previous["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_per_s']:.1f} -> "
+                               f"{current['throughput_per_s']:.1f}/s")
+    return regressions
+
+
+def print_results(results: dict, baseline: Optional[dict] = None):
+    print(f"{'benchmark':<26} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per s':>9} {'p95 vs base':>12}")
+    for name, summary in results.items():
+        if not summary.get("count"):
+            continue
+        change = ""
+        previous = (baseline or {}).get(name)
+        if previous and previous.get("count"):
+            change = f"{(summary['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%"
+        print(f"{name:<26} {summary['count']:>5} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+              f"{summary['p99_ms']:>9.2f} {summary['throughput_per_s']:>9.1f} {change:>12}")
+
+
+def run_benchmarks(stages: List[str], language: str = "English", paraphrases_per_question: int = 3,
+                   pdf_path: str = os.path.join("data", "indian-constitution.pdf"), ingest_chunks: int = 300,
+                   stub_first_token_latency: float = 0.05, stub_token_latency: float = 0.0) -> dict:
+    """Run the selected stages on the FAQ and paraphrase workloads and return the report"""
+    questions = faq_workload()
+    queries = questions + paraphrase_workload(questions, paraphrases_per_question)
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": git_revision(),
+        "config": {
+            "stages": stages, "language": language, "queries": len(queries), "faq_questions": len(questions),
+            "embedding_model": resources.EMBEDDING_MODEL, "vector_store": resources.VECTOR_STORE,
+            "unified_index": resources.UNIFIED_INDEX, "ingest_pdf": pdf_path, "ingest_chunks": ingest_chunks,
+            "stub_first_token_latency": stub_first_token_latency, "stub_token_latency": stub_token_latency,
+        },
+        "results": {},
+    }
+
+    stub = None
+    if "e2e" in stages:
+        # Point the chat client at the stub before anything creates it
+        stub = StubLLMServer(first_token_latency=stub_first_token_latency, token_latency=stub_token_latency).start()
+        os.environ["AZURE_OPENAI_ENDPOINT"] = stub.url
+        os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+        os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-06-01")
+    try:
+        if "ingestion" in stages:
+            report["results"].update(bench_ingestion(pdf_path, ingest_chunks))
+        if "embedding" in stages:
+            report["results"].update(bench_query_embedding(queries))
+        if "search" in stages:
+            report["results"].update(bench_vector_search(queries, language))
+        if "e2e" in stages:
+            report["results"].update(bench_end_to_end(queries, language))
+    finally:
+        if stub is not None:
+            stub.stop()
+    return report
+
+
+if __name__ == "__main__":
+    # Other modules configure INFO logging on import; per-request logs would bury the table
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and answering")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--paraphrases", type=int, default=3, help="Paraphrases generated per FAQ question")
+    parser.add_argument("--pdf", default=os.path.join("data", "indian-constitution.pdf"), help="PDF for the ingestion stage")
+    parser.add_argument("--ingest-chunks", type=int, default=300, help="Stop ingestion after this many chunks")
+    parser.add_argument("--stub-first-token-latency", type=float, default=0.05)
+    parser.add_argument("--stub-token-latency", type=float, default=0.0)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--baseline", help="Result file to compare with (default: the latest in --results-dir)")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--no-save", action="store_true", help="Do not write the results file")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(stages, args.language, args.paraphrases, args.pdf, args.ingest_chunks,
+                            args.stub_first_token_latency, args.stub_token_latency)
+    path = None if args.no_save else save_results(report, args.results_dir)
+    baseline_path = args.baseline or latest_results(args.results_dir, exclude=path)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"Commit {report['revision']['commit']}{' (dirty)' if report['revision']['dirty'] else ''}, "
+          f"{report['config']['queries']} queries"
+          + (f", baseline {baseline['revision']['commit']}" if baseline else ""))
+    print_results(report["results"], baseline["results"] if baseline else None)
+    if path:
+        print(f"Saved {path}")
+    if baseline:
+        regressions = find_regressions(report["results"], baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
@@ -1,119 +1,499 @@
 import os
-from chroma_utils import ChromaDBClient
-from typing import List
+from chroma_utils import ChromaDBClient, EMBEDDING_MODEL, MULTILINGUAL_EMBEDDING_MODEL, UNIFIED_COLLECTION
+from embedding_utils import EmbeddingStage, EMBED_BATCH_SIZE, EMBED_WORKERS
+from structural_index import StructuralIndex, build_language_index
+from process_stats import resident_memory_bytes, directory_size, format_bytes
+from typing import Iterator, List, Optional
 import PyPDF2
-import uuid
+import re
+import json
+import time
+import queue
+import hashlib
 import logging
+import argparse
+import threading
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 
-def split_pdf_into_chunks(pdf_path: str, chunk_size: int = 1000) -> List[tuple]:
-    """Split PDF into chunks with metadata"""
-    chunks = []
-    
+DATA_DIR = "data"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNKER_VERSION = 2
+
+# Records each PDF's hash and build parameters so unchanged PDFs are skipped
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# New chunks of a PDF are embedded and written this many at a time
+EMBED_SLICE_SIZE = EMBED_BATCH_SIZE * 8
+
+# Chunks end after sentence punctuation (including the Devanagari danda used by
+# Hindi and Marathi) or before an Article, Part or Schedule heading
+SEGMENT_BOUNDARY = re.compile(
+    r"(?<=[.?!\u0964\u0965])\s+"
+    r"|\n(?=\s*(?:\d+[A-Z]*\.\s|PART\s+[IVXLC]+\b|[A-Z]+\s+SCHEDULE\b|Article\s+\d+))"
+)
+
+# List of supported languages and their PDF files
+LANGUAGE_PDFS = {
+    "English": "indian-constitution.pdf",
+    "Hindi": "ic-hindi.pdf",
+    "Telugu": "ic-telugu.pdf",
+    "Tamil": "ic-tamil.pdf",
+    "Marathi": "ic-marathi.pdf",
+    "Gujarati": "ic-gujarati.pdf",
+    "Kannada": "ic-kannada.pdf",
+    "Malayalam": "ic-malayalam.pdf"
+}
+
+def file_sha256(path: str) -> str:
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def index_version(data_dir: str = DATA_DIR, chunk_size: int = CHUNK_SIZE,
+                  chunk_overlap: int = CHUNK_OVERLAP) -> str:
+    """Fingerprint of the index inputs: every source PDF and the chunking parameters"""
+    digest = hashlib.sha256(
+        f"chunker={CHUNKER_VERSION};chunk_size={chunk_size};chunk_overlap={chunk_overlap}".encode()
+    )
+    for language, pdf_file in sorted(LANGUAGE_PDFS.items()):
+        pdf_path = os.path.join(data_dir, pdf_file)
+        if os.path.exists(pdf_path):
+            digest.update(f"{language}:{file_sha256(pdf_path)}".encode())
+    return digest.hexdigest()[:16]
+
+def _split_point(text: str, limit: int) -> int:
+    """Where to cut an over-long segment: the last space before limit, never inside a grapheme"""
+    cut = text.rfind(" ", limit // 2, limit)
+    if cut > 0:
+        return cut
+    cut = limit
+    # Indic vowel signs and viramas are combining marks; keep them with their consonant
+    while cut < len(text) and unicodedata.category(text[cut]).startswith("M"):
+        cut += 1
+    return cut
+
+def iter_segments(text: str, max_length: int) -> Iterator[str]:
+    """Split page text into sentences and headings no longer than max_length"""
+    for segment in SEGMENT_BOUNDARY.split(text):
+        segment = " ".join(segment.split())
+        while len(segment) > max_length:
+            cut = _split_point(segment, max_length)
+            yield segment[:cut].rstrip()
+            segment = segment[cut:].lstrip()
+        if segment:
+            yield segment
+
+def iter_pdf_chunks(pdf_path: str, chunk_size: int = CHUNK_SIZE,
+                    chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[tuple]:
+    """Stream chunks of about chunk_size characters from a PDF, one page at a time.
+
+    Chunks end on sentence, danda or Article/Part/Schedule heading boundaries
+    and repeat up to chunk_overlap characters of trailing sentences from the
+    previous chunk. Only the current chunk's segments are held in memory.
+    Metadata records the exact first and last page of each chunk.
+    """
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+    source = os.path.basename(pdf_path)
+    buffer = deque()  # (segment, page_num)
+    size = 0          # characters in buffer, counting one joining space per segment
+    carried = 0       # characters in buffer already emitted as overlap
+    chunk_index = 0
+
+    def make_chunk(segments):
+        return (
+            " ".join(segment for segment, _ in segments),
+            {
+                "source": source,
+                "page_range": f"{segments[0][1]}-{segments[-1][1]}",
+                "page_start": segments[0][1],
+                "page_end": segments[-1][1],
+                "chunk_id": str(chunk_index)
+            }
+        )
+
     try:
         with open(pdf_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            current_chunk = ""
-            chunk_start_page = 1
-            
             for page_num, page in enumerate(pdf_reader.pages, 1):
-                text = page.extract_text()
-                current_chunk += text
-                
-                if len(current_chunk) >= chunk_size:
-                    chunks.append((
-                        current_chunk.strip(),
-                        {
-                            "source": os.path.basename(pdf_path),
-                            "page_range": f"{chunk_start_page}-{page_num}",
-                            "chunk_id": str(len(chunks))
-                        }
-                    ))
-                    current_chunk = ""
-                    chunk_start_page = page_num + 1
-            
+                text = unicodedata.normalize("NFC", page.extract_text() or "")
+                for segment in iter_segments(text, chunk_size):
+                    if size + len(segment) + 1 > chunk_size and size > carried:
+                        segments = list(buffer)
+                        yield make_chunk(segments)
+                        chunk_index += 1
+
+                        # Carry trailing sentences into the next chunk as overlap
+                        buffer.clear()
+                        size = 0
+                        for previous, previous_page in reversed(segments[1:]):
+                            if size + len(previous) + 1 > chunk_overlap:
+                                break
+                            buffer.appendleft((previous, previous_page))
+                            size += len(previous) + 1
+
+                        carried = size
+
+                    # Drop overlap that would push the next chunk past chunk_size
+                    while carried and size + len(segment) + 1 > chunk_size:
+                        dropped = len(buffer.popleft()[0]) + 1
+                        size -= dropped
+                        carried -= dropped
+                    buffer.append((segment, page_num))
+                    size += len(segment) + 1
+
             # Add remaining text if any
-            if current_chunk:
-                chunks.append((
-                    current_chunk.strip(),
-                    {
-                        "source": os.path.basename(pdf_path),
-                        "page_range": f"{chunk_start_page}-{page_num}",
-                        "chunk_id": str(len(chunks))
-                    }
-                ))
+            if size > carried:
+                yield make_chunk(list(buffer))
     except Exception as e:
         logging.error("Error processing PDF %s: %s", pdf_path, str(e))
         raise
-    
-    return chunks
 
-def initialize_chroma_db():
-    """Initialize ChromaDB with constitution documents"""
+def split_pdf_into_chunks(pdf_path: str, chunk_size: int = CHUNK_SIZE,
+                          chunk_overlap: int = CHUNK_OVERLAP) -> List[tuple]:
+    """Split PDF into chunks with metadata, all held in one list"""
+    return list(iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap))
+
+class StageStats:
+    """Items processed and busy time of one ingestion stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def add(self, items: int, seconds: float):
+        self.items += items
+        self.seconds += seconds
+
+    def log(self):
+        rate = self.items / self.seconds if self.seconds else 0.0
+        logging.info("Stage %-8s %6d chunks in %7.2fs busy (%.1f chunks/s)", self.name, self.items, self.seconds, rate)
+
+def extract_chunks(pdf_path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> tuple:
+    """Split a PDF into chunks in a worker process and report how long it took.
+
+    The whole PDF's chunks come back at once: incremental builds need every
+    chunk ID of a PDF to know what to keep and delete. Their vectors are
+    what the build holds only a slice at a time.
+    """
+    start = time.perf_counter()
+    chunks = split_pdf_into_chunks(pdf_path, chunk_size, chunk_overlap)
+    return chunks, time.perf_counter() - start
+
+def chunk_ids(chunks: List[tuple]) -> List[str]:
+    """Content-addressed IDs: a chunk keeps its ID across builds as long as its source and text are unchanged"""
+    ids = []
+    seen = {}
+    for text, meta in chunks:
+        digest = hashlib.sha256(f"{meta['source']}\0{text}".encode("utf-8")).hexdigest()[:32]
+        # Repeated identical chunks within one PDF get an occurrence suffix
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+def load_manifest(persist_dir: str) -> dict:
+    """Load the build manifest, or an empty one if missing or from another manifest version"""
+    try:
+        with open(os.path.join(persist_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(persist_dir: str, manifest: dict):
+    """Write the build manifest atomically"""
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+def write_collections(client: ChromaDBClient, write_queue: queue.Queue, stats: StageStats, errors: list,
+                      persist_dir: str, manifest: dict, structural_index: StructuralIndex):
+    """Single writer: the only code that touches Chroma, the manifest and the structural index during a build"""
+    while True:
+        job = write_queue.get()
+        if job is None:
+            return
+        if errors:
+            # Keep draining so the producer never blocks on a full queue
+            continue
+        language = job["language"]
+        collection_name = job["collection_name"]
+        try:
+            start = time.perf_counter()
+            if job["first"]:
+                client.create_collection(
+                    collection_name=collection_name,
+                    language=job["collection_language"]
+                )
+                if job["delete_ids"]:
+                    client.delete_documents(collection_name, job["delete_ids"])
+                if job["update_ids"]:
+                    client.update_metadata(collection_name, job["update_ids"], job["update_metadata"])
+            if job["ids"]:
+                client.add_documents(
+                    collection_name=collection_name,
+                    texts=job["texts"],
+                    metadata=job["metadata"],
+                    ids=job["ids"],
+                    embeddings=job["embeddings"]
+                )
+            stats.add(len(job["ids"]), time.perf_counter() - start)
+            if not job["last"]:
+                continue
+
+            # The manifest only records the PDF once its last slice is written
+            structural_index.set_language(language, job["structure"])
+            structural_index.save()
+            manifest["files"][job["manifest_key"]] = job["manifest_entry"]
+            save_manifest(persist_dir, manifest)
+            logging.info(
+                "Successfully updated %s in %s: %d added, %d kept, %d deleted",
+                language, collection_name, job["added"], job["kept"], job["deleted"]
+            )
+        except Exception as e:
+            errors.append(e)
+
+def initialize_chroma_db(extract_workers: Optional[int] = None, embed_batch_size: int = EMBED_BATCH_SIZE,
+                         embed_workers: int = EMBED_WORKERS, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                         rebuild: bool = False, unified: bool = False):
+    """Initialize ChromaDB with constitution documents.
+
+    The build is pipelined: PDFs are extracted and chunked in a process pool,
+    chunks are embedded by an EmbeddingStage as each PDF completes, and a
+    single writer thread loads them with their vectors into Chroma. Results are consumed in LANGUAGE_PDFS order
+    with deterministic IDs, so the index matches a run with extract_workers=1.
+
+    Builds are incremental. PDFs whose hash and build parameters match the
+    manifest are skipped. For changed PDFs only new chunks are embedded, chunks
+    that no longer exist are deleted and the rest keep their embeddings.
+    Pass rebuild=True to drop every collection first.
+
+    With unified=True every language goes into the single UNIFIED_COLLECTION,
+    embedded with MULTILINGUAL_EMBEDDING_MODEL, instead of one collection per
+    language. Each chunk carries its language in metadata for filtering.
+
+    Alongside the collections it maintains a structural index mapping
+    Articles, Parts and Schedules to chunk IDs and pages.
+    """
     # Create ChromaDB client with persistent storage
     persist_dir = os.path.join(os.getcwd(), "chroma_db")
     os.makedirs(persist_dir, exist_ok=True)
     
-    client = ChromaDBClient(persist_directory=persist_dir)
-    
-    # List of supported languages and their PDF files
-    languages = {
-        "English": "indian-constitution.pdf",
-        "Hindi": "ic-hindi.pdf",
-        "Telugu": "ic-telugu.pdf",
-        "Tamil": "ic-tamil.pdf",
-        "Marathi": "ic-marathi.pdf",
-        "Gujarati": "ic-gujarati.pdf",
-        "Kannada": "ic-kannada.pdf",
-        "Malayalam": "ic-malayalam.pdf"
-    }
-    
-    for language, pdf_file in languages.items():
+    model_name = MULTILINGUAL_EMBEDDING_MODEL if unified else EMBEDDING_MODEL
+    client = ChromaDBClient(persist_directory=persist_dir, model_name=model_name)
+    manifest = {"version": MANIFEST_VERSION, "files": {}} if rebuild else load_manifest(persist_dir)
+    structural_index = StructuralIndex(persist_dir)
+    if rebuild:
+        structural_index.languages = {}
+
+    if unified:
+        unified_keys = [key for key in manifest["files"] if key.startswith(f"{UNIFIED_COLLECTION}/")]
+        if rebuild or any(manifest["files"][key].get("embedding_model") != model_name for key in unified_keys):
+            # Vectors from another model cannot be kept, and they share one collection
+            client.create_collection(collection_name=UNIFIED_COLLECTION, language="all", reset=True)
+            for key in unified_keys:
+                del manifest["files"][key]
+
+    jobs = []
+    for language, pdf_file in LANGUAGE_PDFS.items():
+        pdf_path = os.path.join(DATA_DIR, pdf_file)
+        if not os.path.exists(pdf_path):
+            logging.warning("PDF file not found: %s", pdf_file)
+            continue
+
+        if unified:
+            target = {"collection_name": UNIFIED_COLLECTION, "collection_language": "all",
+                      "manifest_key": f"{UNIFIED_COLLECTION}/{language}"}
+        else:
+            target = {"collection_name": f"constitution_{language.lower()}", "collection_language": language,
+                      "manifest_key": language}
+        collection_name = target["collection_name"]
+        if rebuild and not unified:
+            client.create_collection(collection_name=collection_name, language=language, reset=True)
+
+        manifest_entry = {
+            "source": pdf_file,
+            "sha256": file_sha256(pdf_path),
+            "chunker": CHUNKER_VERSION,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "embedding_model": model_name
+        }
+        existing_ids = client.get_document_ids(collection_name, where={"language": language} if unified else None)
+        previous = manifest["files"].get(target["manifest_key"])
+        if previous and {k: previous.get(k) for k in manifest_entry} == manifest_entry \
+                and previous.get("chunks") == len(existing_ids) and language in structural_index.languages:
+            logging.info("Skipping %s: %s is unchanged", language, pdf_file)
+            continue
+        if previous and previous.get("embedding_model") != model_name:
+            # Vectors from another model cannot be kept
+            existing_ids = []
+            client.create_collection(collection_name=collection_name, language=language, reset=True)
+
+        jobs.append((language, pdf_file, pdf_path, dict(target, manifest_entry=manifest_entry), set(existing_ids)))
+
+    extract_stats, embed_stats, write_stats = StageStats("extract"), StageStats("embed"), StageStats("write")
+    embedder = EmbeddingStage(model_name=model_name, batch_size=embed_batch_size, workers=embed_workers) if jobs else None
+    write_queue = queue.Queue(maxsize=2)
+    write_errors = []
+    writer = threading.Thread(
+        target=write_collections,
+        args=(client, write_queue, write_stats, write_errors, persist_dir, manifest, structural_index),
+        daemon=True
+    )
+    writer.start()
+    build_start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=extract_workers) as pool:
+            futures = [
+                (language, pdf_file, target, existing_ids,
+                 pool.submit(extract_chunks, pdf_path, chunk_size, chunk_overlap))
+                for language, pdf_file, pdf_path, target, existing_ids in jobs
+            ]
+            for language, pdf_file, target, existing_ids, future in futures:
+                if write_errors:
+                    break
+                try:
+                    logging.info("Processing %s constitution...", language)
+                    chunks, seconds = future.result()
+                    extract_stats.add(len(chunks), seconds)
+
+                    if not chunks:
+                        logging.warning("No content extracted from %s", pdf_file)
+                    for _, meta in chunks:
+                        meta["language"] = language
+
+                    # Only chunks whose content is new need embedding
+                    ids = chunk_ids(chunks)
+                    new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing_ids]
+                    kept = [i for i, chunk_id in enumerate(ids) if chunk_id in existing_ids]
+                    delete_ids = sorted(existing_ids - set(ids))
+
+                    # Embed and write a slice at a time; the bounded write queue keeps
+                    # only a few slices of vectors in memory however large the PDF
+                    slices = [new[i:i + EMBED_SLICE_SIZE] for i in range(0, len(new), EMBED_SLICE_SIZE)] or [[]]
+                    for number, part in enumerate(slices):
+                        texts = [chunks[i][0] for i in part]
+                        start = time.perf_counter()
+                        embeddings = embedder.encode(texts)
+                        embed_stats.add(len(texts), time.perf_counter() - start)
+
+                        job = {
+                            "language": language,
+                            "collection_name": target["collection_name"],
+                            "collection_language": target["collection_language"],
+                            "texts": texts,
+                            "metadata": [chunks[i][1] for i in part],
+                            "ids": [ids[i] for i in part],
+                            "embeddings": embeddings,
+                            "first": number == 0,
+                            "last": number == len(slices) - 1
+                        }
+                        if job["first"]:
+                            job.update(
+                                update_ids=[ids[i] for i in kept],
+                                update_metadata=[chunks[i][1] for i in kept],
+                                delete_ids=delete_ids
+                            )
+                        if job["last"]:
+                            job.update(
+                                manifest_key=target["manifest_key"],
+                                structure=build_language_index(chunks, ids),
+                                manifest_entry=dict(target["manifest_entry"], chunks=len(ids)),
+                                added=len(new), kept=len(kept), deleted=len(delete_ids)
+                            )
+                        write_queue.put(job)
+
+                except (FileNotFoundError, ValueError) as e:
+                    logging.error("Error processing %s: %s", language, str(e))
+                    continue
+    finally:
+        write_queue.put(None)
+        writer.join()
+        if embedder is not None:
+            embedder.close()
+
+    if write_errors:
+        raise write_errors[0]
+
+    for stats in (extract_stats, embed_stats, write_stats):
+        stats.log()
+    logging.info("Updated %d languages in %.2fs wall time", len(jobs), time.perf_counter() - build_start)
+
+def report_index_footprint(unified: bool = False) -> dict:
+    """Open the index the way the app does and report its memory and disk footprint.
+
+    Every collection is queried once so its vector index is loaded. Resident
+    memory is measured before the client is created, after the embedding
+    model is loaded and after all collections are in memory.
+    """
+    persist_dir = os.path.join(os.getcwd(), "chroma_db")
+    if unified:
+        model_name, collection_names = MULTILINGUAL_EMBEDDING_MODEL, [UNIFIED_COLLECTION]
+    else:
+        model_name, collection_names = EMBEDDING_MODEL, [f"constitution_{language.lower()}" for language in LANGUAGE_PDFS]
+
+    report = {"model": model_name, "rss_start": resident_memory_bytes()}
+    client = ChromaDBClient(persist_directory=persist_dir, model_name=model_name)
+    client.embed_query("warm up")
+    report["rss_model"] = resident_memory_bytes()
+
+    report["chunks"] = {}
+    for collection_name in collection_names:
         try:
-            pdf_path = os.path.join("data", pdf_file)
-            
-            if not os.path.exists(pdf_path):
-                logging.warning("PDF file not found: %s", pdf_file)
-                continue
-            
-            logging.info("Processing %s constitution...", language)
-            
-            # Create collection for language
-            client.create_collection(
-                collection_name=f"constitution_{language.lower()}",
-                language=language
-            )
-            
-            # Split PDF into chunks
-            chunks = split_pdf_into_chunks(pdf_path)
-            
-            if not chunks:
-                logging.warning("No content extracted from %s", pdf_file)
-                continue
-            
-            # Prepare data for insertion
-            texts = [chunk[0] for chunk in chunks]
-            metadata = [chunk[1] for chunk in chunks]
-            ids = [str(uuid.uuid4()) for _ in chunks]
-            
-            # Add documents to collection
-            client.add_documents(
-                collection_name=f"constitution_{language.lower()}",
-                texts=texts,
-                metadata=metadata,
-                ids=ids
-            )
-            
-            logging.info("Successfully initialized %s collection with %d chunks", language, len(chunks))
-            
-        except (FileNotFoundError, ValueError) as e:
-            logging.error("Error processing %s: %s", language, str(e))
+            report["chunks"][collection_name] = client.get_collection(collection_name).count()
+        except Exception:
+            logging.warning("Collection %s does not exist", collection_name)
             continue
+        client.query_collection(collection_name, "Fundamental rights", n_results=1)
+    report["rss_loaded"] = resident_memory_bytes()
+    report["index_bytes"] = directory_size(persist_dir)
+
+    logging.info("Index footprint for %s (%s):", ", ".join(report["chunks"]) or "no collections", model_name)
+    logging.info("  chunks:               %d", sum(report["chunks"].values()))
+    logging.info("  size on disk:         %s", format_bytes(report["index_bytes"]))
+    logging.info("  resident memory:      %s", format_bytes(report["rss_loaded"]))
+    logging.info("    embedding model:    %s", format_bytes(report["rss_model"] - report["rss_start"]))
+    logging.info("    loaded collections: %s", format_bytes(report["rss_loaded"] - report["rss_model"]))
+    return report
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the ChromaDB index from the constitution PDFs")
+    parser.add_argument("--extract-workers", type=int, default=None,
+                        help="Processes for PDF extraction and chunking (default: CPU count)")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Chunks embedded per batch")
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS,
+                        help="Processes for embedding; 1, the default, encodes in the main process")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Drop every collection and rebuild from scratch instead of updating incrementally")
+    parser.add_argument("--unified", action="store_true",
+                        help=f"Build the single multilingual {UNIFIED_COLLECTION} collection instead of one per language")
+    parser.add_argument("--report", action="store_true",
+                        help="Report resident memory and index size instead of building")
+    args = parser.parse_args()
     try:
-        initialize_chroma_db()
-        logging.info("ChromaDB initialization completed successfully")
+        if args.report:
+            report_index_footprint(unified=args.unified)
+        else:
+            initialize_chroma_db(extract_workers=args.extract_workers, embed_batch_size=args.embed_batch_size,
+                                 embed_workers=args.embed_workers, rebuild=args.rebuild, unified=args.unified)
+            logging.info("ChromaDB initialization completed successfully")
     except Exception as e:
-        logging.error("ChromaDB initialization failed: %s", str(e))
\ No newline at end of file
+        logging.error("ChromaDB initialization failed: %s", str(e))
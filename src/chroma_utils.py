@@ -1,13 +1,48 @@
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
 import os
+import json
 import logging
-from typing import Optional, List
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, List, Tuple, Union
+import numpy as np
+import telemetry
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # This is a lightweight, efficient model
+
+# The optional unified index holds every language in one collection, embedded
+# with a multilingual model and tagged with a "language" metadata field
+MULTILINGUAL_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+UNIFIED_COLLECTION = "constitution_all"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+
+def language_target(language: str, unified: bool = False, language_filter: bool = False) -> Tuple[str, Optional[dict]]:
+    """The collection holding a language and the metadata filter selecting it, as (name, where)"""
+    if unified:
+        return UNIFIED_COLLECTION, {"language": language} if language_filter else None
+    return f"constitution_{language.lower()}", None
+
+
+def combine_where(*clauses: Optional[dict]) -> Optional[dict]:
+    """Join metadata filters with $and, skipping empty ones"""
+    clauses = [clause for clause in clauses if clause]
+    if len(clauses) > 1:
+        return {"$and": clauses}
+    return clauses[0] if clauses else None
 
 class ChromaDBClient:
-    def __init__(self, persist_directory: str = "./chroma_db"):
-        """Initialize ChromaDB client with persistent storage"""
+    def __init__(self, persist_directory: str = "./chroma_db", embedding_function=None,
+                 model_name: str = EMBEDDING_MODEL, backend: Optional[str] = None):
+        """Initialize ChromaDB client with persistent storage.
+
+        chromadb and the embedding backend are imported here rather than at
+        module level, so importing this module for its constants stays cheap.
+        """
+        import chromadb
+        from chromadb.config import Settings
+        from embedding_backends import BackendEmbeddingFunction, EMBEDDING_BACKEND
+
         # Ensure the persistence directory exists
         os.makedirs(persist_directory, exist_ok=True)
         
@@ -21,78 +56,337 @@ class ChromaDBClient:
             )
         )
         
-        # Initialize the embedding function
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"  # This is a lightweight, efficient model
-        )
+        # Initialize the embedding function, reusing a shared one when given
+        self.model_name = model_name
+        self.embedding_function = embedding_function or BackendEmbeddingFunction(model_name, backend or EMBEDDING_BACKEND)
+        self._init_caches()
+
+    def _init_caches(self):
+        """Hot query-path caches: collection handles and query embeddings"""
+        self._lock = threading.Lock()
+        self._collections = {}
+        self._query_embeddings = OrderedDict()
+        self._cache_stats = {
+            "collection_hits": 0, "collection_misses": 0,
+            "embedding_hits": 0, "embedding_misses": 0
+        }
+
+    def get_collection(self, collection_name: str):
+        """Return a cached handle for an existing collection"""
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                self._cache_stats["collection_hits"] += 1
+                telemetry.count_cache("collection", hit=True)
+                return collection
+            self._cache_stats["collection_misses"] += 1
+        telemetry.count_cache("collection", hit=False)
+
+        with telemetry.span("open_collection", collection=collection_name):
+            collection = self.client.get_collection(
+                name=collection_name,
+                embedding_function=self.embedding_function
+            )
+        with self._lock:
+            self._collections[collection_name] = collection
+        return collection
+
+    def invalidate_collections(self, collection_name: Optional[str] = None):
+        """Forget cached collection handles, all of them or just one"""
+        with self._lock:
+            if collection_name is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(collection_name, None)
+
+    def cache_info(self) -> dict:
+        """Hit/miss counters and sizes of the collection and query embedding caches"""
+        with self._lock:
+            return dict(
+                self._cache_stats,
+                collections_cached=len(self._collections),
+                embeddings_cached=len(self._query_embeddings)
+            )
         
-    def create_collection(self, collection_name: str, language: str):
-        """Create or get a collection for a specific language"""
+    def heartbeat(self) -> int:
+        """Raise if the index cannot be reached"""
+        return self.client.heartbeat()
+
+    def create_collection(self, collection_name: str, language: str, reset: bool = False):
+        """Create or get a collection for a specific language.
+
+        Existing documents are kept so builds can update them incrementally;
+        pass reset=True to drop the collection and start empty.
+        """
         try:
-            # Delete existing collection if it exists
-            try:
-                self.client.delete_collection(name=f"constitution_{language.lower()}")
-            except:
-                pass
-                
-            # Create new collection
-            collection = self.client.create_collection(
-                name=f"constitution_{language.lower()}",
+            self.invalidate_collections(collection_name)
+            if reset:
+                try:
+                    self.client.delete_collection(name=collection_name)
+                except:
+                    pass
+
+            collection = self.client.get_or_create_collection(
+                name=collection_name,
                 embedding_function=self.embedding_function,
                 metadata={"language": language}
             )
+            with self._lock:
+                self._collections[collection.name] = collection
             return collection
         except Exception as e:
             logging.error(f"Error creating collection: {str(e)}")
             raise
 
-    def add_documents(self, collection_name: str, texts: List[str], metadata: List[dict], ids: List[str]):
-        """Add documents to a collection"""
+    def add_documents(self, collection_name: str, texts: List[str], metadata: List[dict], ids: List[str],
+                      embeddings: Optional[List[List[float]]] = None, batch_size: Optional[int] = None):
+        """Add or replace documents in a collection, using precomputed embeddings when given.
+
+        With precomputed embeddings Chroma has no model work to do, so by
+        default they are written in the largest batches it accepts.
+        """
         try:
-            collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
+            collection = self.get_collection(collection_name)
             
             # Add documents in batches to handle large datasets
-            batch_size = 100
+            if batch_size is None:
+                batch_size = self.client.get_max_batch_size() if embeddings is not None else 100
             for i in range(0, len(texts), batch_size):
                 end_idx = min(i + batch_size, len(texts))
-                collection.add(
+                collection.upsert(
                     documents=texts[i:end_idx],
                     metadatas=metadata[i:end_idx],
-                    ids=ids[i:end_idx]
+                    ids=ids[i:end_idx],
+                    embeddings=embeddings[i:end_idx] if embeddings is not None else None
                 )
                 
         except Exception as e:
             logging.error(f"Error adding documents: {str(e)}")
             raise
 
-    def query_collection(self, collection_name: str, query_text: str, n_results: int = 5):
-        """Query a collection and return relevant documents"""
+    def update_metadata(self, collection_name: str, ids: List[str], metadata: List[dict]):
+        """Replace the metadata of existing documents without re-embedding them"""
         try:
-            collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=n_results
-            )
-            return results
+            collection = self.get_collection(collection_name)
+            batch_size = 100
+            for i in range(0, len(ids), batch_size):
+                collection.update(ids=ids[i:i + batch_size], metadatas=metadata[i:i + batch_size])
         except Exception as e:
-            logging.error(f"Error querying collection: {str(e)}")
+            logging.error(f"Error updating documents: {str(e)}")
+            raise
+
+    def delete_documents(self, collection_name: str, ids: List[str]):
+        """Delete documents from a collection by ID"""
+        try:
+            collection = self.get_collection(collection_name)
+            batch_size = 100
+            for i in range(0, len(ids), batch_size):
+                collection.delete(ids=ids[i:i + batch_size])
+        except Exception as e:
+            logging.error(f"Error deleting documents: {str(e)}")
+            raise
+
+    def get_document_ids(self, collection_name: str, where: Optional[dict] = None) -> List[str]:
+        """Return the document IDs in a collection matching where, or an empty list if it does not exist"""
+        try:
+            collection = self.get_collection(collection_name)
+            return collection.get(where=where, include=[])["ids"]
+        except Exception:
+            return []
+
+    def _query_key(self, query_text: str) -> tuple:
+        return (self.model_name, " ".join(unicodedata.normalize("NFC", query_text).split()))
+
+    def embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """Embed query texts in one batch, reusing embeddings of identical earlier queries"""
+        with telemetry.span("embed_queries", queries=len(query_texts)) as span:
+            keys = [self._query_key(text) for text in query_texts]
+            embeddings = [None] * len(query_texts)
+            with self._lock:
+                for i, key in enumerate(keys):
+                    embedding = self._query_embeddings.get(key)
+                    if embedding is not None:
+                        self._query_embeddings.move_to_end(key)
+                        self._cache_stats["embedding_hits"] += 1
+                        embeddings[i] = embedding
+                    else:
+                        self._cache_stats["embedding_misses"] += 1
+            hits = sum(embedding is not None for embedding in embeddings)
+            span.set(cache_hits=hits, cache_misses=len(keys) - hits)
+            telemetry.count_cache("query_embedding", hit=True, count=hits)
+            telemetry.count_cache("query_embedding", hit=False, count=len(keys) - hits)
+
+            # Embed each distinct missing text once, in a single model call
+            missing = list(dict.fromkeys(keys[i] for i, embedding in enumerate(embeddings) if embedding is None))
+            if missing:
+                first_text = {}
+                for key, text in zip(keys, query_texts):
+                    first_text.setdefault(key, text)
+                with telemetry.span("embedding_model", texts=len(missing)):
+                    vectors = self.embedding_function([first_text[key] for key in missing])
+                computed = {key: [float(x) for x in vector] for key, vector in zip(missing, vectors)}
+                with self._lock:
+                    for key, embedding in computed.items():
+                        self._query_embeddings[key] = embedding
+                    while len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                        self._query_embeddings.popitem(last=False)
+                embeddings = [embedding if embedding is not None else computed[key]
+                              for key, embedding in zip(keys, embeddings)]
+            return embeddings
+
+    def embed_query(self, query_text: str) -> List[float]:
+        """Embed a single query text, reusing the embedding of an identical earlier query"""
+        return self.embed_queries([query_text])[0]
+
+    def query_collection(self, collection_name: str, query_text: str, n_results: int = 5,
+                         query_embedding: Optional[List[float]] = None, where: Optional[dict] = None):
+        """Query a collection and return relevant documents.
+
+        The query embedding is returned under "query_embeddings" so callers can
+        reuse it; pass it back in as query_embedding to skip re-embedding.
+        """
+        with telemetry.span("query_collection", collection=collection_name, n_results=n_results,
+                            filtered=where is not None) as span:
+            try:
+                if query_embedding is None:
+                    query_embedding = self.embed_query(query_text)
+                collection = self.get_collection(collection_name)
+                with telemetry.span("vector_search"):
+                    results = collection.query(
+                        query_embeddings=[query_embedding],
+                        n_results=n_results,
+                        where=where
+                    )
+                results["query_embeddings"] = [query_embedding]
+                span.set(results=len(results["ids"][0]))
+                return results
+            except Exception as e:
+                span.fail(e)
+                logging.error(f"Error querying collection: {str(e)}")
             # Return empty results in case of error
-            return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]],
+                    "query_embeddings": [query_embedding]}
+
+    def get_documents(self, collection_name: str, ids: List[str],
+                      query_embedding: Optional[List[float]] = None) -> dict:
+        """Fetch documents by ID, shaped like a query_collection result.
+
+        Without a query embedding the documents come in the order of ids with
+        zero distances. With one they are ranked by their cosine distance to
+        it, the distance a vector search of the collections, which are built
+        in Chroma's cosine space, reports.
+        """
+        results = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        include = ["documents", "metadatas"] + (["embeddings"] if query_embedding is not None else [])
+        with telemetry.span("get_documents", collection=collection_name, ids=len(ids)) as span:
+            try:
+                fetched = self.get_collection(collection_name).get(ids=ids, include=include)
+                if query_embedding is not None and fetched["ids"]:
+                    vectors = np.asarray(fetched["embeddings"], dtype=np.float32).reshape(len(fetched["ids"]), -1)
+                    query = np.asarray(query_embedding, dtype=np.float32)
+                    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+                    distances = 1 - (vectors @ query) / np.where(norms == 0, 1, norms)
+                else:
+                    distances = np.zeros(len(fetched["ids"]))
+                by_id = {
+                    doc_id: (document, meta, float(distance))
+                    for doc_id, document, meta, distance in zip(fetched["ids"], fetched["documents"],
+                                                                fetched["metadatas"], distances)
+                }
+                found = [doc_id for doc_id in ids if doc_id in by_id]
+                if query_embedding is not None:
+                    found.sort(key=lambda doc_id: by_id[doc_id][2])
+                results["ids"] = [found]
+                results["documents"] = [[by_id[doc_id][0] for doc_id in found]]
+                results["metadatas"] = [[by_id[doc_id][1] for doc_id in found]]
+                results["distances"] = [[by_id[doc_id][2] for doc_id in found]]
+                span.set(results=len(found))
+            except Exception as e:
+                span.fail(e)
+                logging.error(f"Error getting documents: {str(e)}")
+        return results
+
+    def query_collection_many(self, collection_name: str, query_texts: List[str],
+                              n_results: Union[int, List[int]] = 5,
+                              where: Union[None, dict, List[Optional[dict]]] = None,
+                              query_embeddings: Optional[List[List[float]]] = None) -> List[dict]:
+        """Query a collection with many questions at once.
+
+        The questions are embedded in one batch and searched with one
+        vectorized query per distinct metadata filter. n_results and where may
+        be given per question. Returns one result dict per question, in input
+        order, shaped like the result of query_collection.
+        """
+        if not query_texts:
+            return []
+        n_per_query = n_results if isinstance(n_results, list) else [n_results] * len(query_texts)
+        where_per_query = where if isinstance(where, list) else [where] * len(query_texts)
+        if len(n_per_query) != len(query_texts) or len(where_per_query) != len(query_texts):
+            raise ValueError("n_results and where lists must match query_texts in length")
+
+        with telemetry.span("query_collection_many", collection=collection_name, queries=len(query_texts)) as span:
+            if query_embeddings is None:
+                query_embeddings = self.embed_queries(query_texts)
+            results = [
+                {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]],
+                 "query_embeddings": [embedding]}
+                for embedding in query_embeddings
+            ]
+            try:
+                collection = self.get_collection(collection_name)
+
+                # Queries sharing a filter are searched together
+                groups = {}
+                for i, query_where in enumerate(where_per_query):
+                    groups.setdefault(json.dumps(query_where, sort_keys=True), []).append(i)
+
+                for indices in groups.values():
+                    with telemetry.span("vector_search", queries=len(indices)):
+                        batch = collection.query(
+                            query_embeddings=[query_embeddings[i] for i in indices],
+                            n_results=max(n_per_query[i] for i in indices),
+                            where=where_per_query[indices[0]]
+                        )
+                    for row, i in enumerate(indices):
+                        limit = n_per_query[i]
+                        for field in ("ids", "documents", "metadatas", "distances"):
+                            if batch.get(field) is not None:
+                                results[i][field] = [batch[field][row][:limit]]
+            except Exception as e:
+                span.fail(e)
+                logging.error(f"Error querying collection: {str(e)}")
+        return results
+
+    def query_languages_many(self, languages: List[str], query_texts: List[str],
+                             n_results: Union[int, List[int]] = 5,
+                             where: Union[None, dict, List[Optional[dict]]] = None,
+                             unified: bool = False, language_filter: bool = False) -> dict:
+        """Query several languages with many questions at once.
+
+        The questions are embedded once and reused for every language. Each
+        language is searched where language_target puts it: its own
+        collection, or the unified one with its language filter joined to
+        where. Returns {language: [result per question]}.
+        """
+        query_embeddings = self.embed_queries(query_texts) if query_texts else []
+        where_per_query = where if isinstance(where, list) else [where] * len(query_texts)
+        results = {}
+        for language in languages:
+            collection_name, language_where = language_target(language, unified, language_filter)
+            results[language] = self.query_collection_many(
+                collection_name=collection_name,
+                query_texts=query_texts,
+                n_results=n_results,
+                where=[combine_where(query_where, language_where) for query_where in where_per_query],
+                query_embeddings=query_embeddings
+            )
+        return results
 
     def get_language_collection(self, language: str):
         """Get the collection for a specific language"""
         try:
             collection_name = f"constitution_{language.lower()}"
-            return self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
+            return self.get_collection(collection_name)
         except Exception as e:
             logging.error(f"Error getting collection: {str(e)}")
             return None
\ No newline at end of file
@@ -0,0 +1,109 @@
+import sys
+import time
+import logging
+import argparse
+from typing import List
+import numpy as np
+from chroma_utils import ChromaDBClient, EMBEDDING_MODEL
+from embedding_backends import load_sentence_transformer, EMBEDDING_BACKENDS, ONNX_QUANTIZATION
+from embedding_utils import EMBED_BATCH_SIZE
+from faq import constitution_faq, amendment_faq
+
+logging.basicConfig(level=logging.INFO)
+
+# The quantized backend passes when every embedding stays this close to the PyTorch one
+PARITY_MIN_COSINE = 0.98
+
+
+def load_corpus(collection_name: str, model_name: str, limit: int = 0) -> List[str]:
+    """Chunk texts of an indexed collection, the corpus the app actually embeds"""
+    client = ChromaDBClient(persist_directory="./chroma_db", model_name=model_name, backend="torch")
+    documents = client.get_collection(collection_name).get(include=["documents"])["documents"]
+    return documents[:limit] if limit else documents
+
+
+def encode(model, texts: List[str], batch_size: int) -> np.ndarray:
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def measure_backend(model, corpus: List[str], queries: List[str], batch_size: int = EMBED_BATCH_SIZE) -> dict:
+    """Single-query latency and corpus throughput of one loaded model"""
+    encode(model, queries[:2], batch_size)  # warm up
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        encode(model, [query], batch_size)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    corpus_vectors = encode(model, corpus, batch_size)
+    corpus_seconds = time.perf_counter() - start
+
+    return {
+        "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "query_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "corpus_chunks_per_second": len(corpus) / corpus_seconds,
+        "corpus_vectors": corpus_vectors,
+        "query_vectors": encode(model, queries, batch_size),
+    }
+
+
+def compare_backends(model_name: str, collection_name: str, limit: int = 0, top_k: int = 5) -> dict:
+    """Embed the corpus and the FAQ questions with every backend and compare against PyTorch.
+
+    Parity is the cosine similarity between the two backends' embeddings of
+    the same text, and the overlap of the top_k chunks each retrieves for
+    the FAQ questions.
+    """
+    models, load_seconds = {}, {}
+    for backend in EMBEDDING_BACKENDS:
+        start = time.perf_counter()
+        models[backend] = load_sentence_transformer(model_name, backend)
+        load_seconds[backend] = time.perf_counter() - start
+
+    corpus = load_corpus(collection_name, model_name, limit)
+    queries = constitution_faq + amendment_faq
+    logging.info("Comparing backends on %d chunks of %s and %d questions", len(corpus), collection_name, len(queries))
+
+    results = {
+        backend: dict(measure_backend(model, corpus, queries), load_seconds=load_seconds[backend])
+        for backend, model in models.items()
+    }
+    reference = results["torch"]
+    reference_top = np.argsort(-(reference["query_vectors"] @ reference["corpus_vectors"].T), axis=1)[:, :top_k]
+    for backend, result in results.items():
+        corpus_cosine = np.sum(result["corpus_vectors"] * reference["corpus_vectors"], axis=1)
+        query_cosine = np.sum(result["query_vectors"] * reference["query_vectors"], axis=1)
+        top = np.argsort(-(result["query_vectors"] @ result["corpus_vectors"].T), axis=1)[:, :top_k]
+        result["min_cosine"] = float(min(corpus_cosine.min(), query_cosine.min()))
+        result["mean_cosine"] = float(np.concatenate([corpus_cosine, query_cosine]).mean())
+        result["top_k_overlap"] = float(np.mean([
+            len(set(row) & set(reference_row)) / top_k for row, reference_row in zip(top, reference_top)
+        ]))
+    for result in results.values():
+        del result["corpus_vectors"], result["query_vectors"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check parity and compare speed of the PyTorch and quantized ONNX embedding backends")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Sentence-transformers model to compare")
+    parser.add_argument("--collection", default="constitution_english", help="Collection whose chunks are the corpus")
+    parser.add_argument("--limit", type=int, default=0, help="Use only the first N chunks (default: all)")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    results = compare_backends(args.model, args.collection, args.limit, args.top_k)
+    print(f"{args.model}, ONNX quantization {ONNX_QUANTIZATION}")
+    print(f"{'backend':<8} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'chunks/s':>9} {'min cos':>8} {'mean cos':>8} {'top-k':>6}")
+    for backend, result in results.items():
+        print(f"{backend:<8} {result['load_seconds']:>8.2f} {result['query_p50_ms']:>8.2f} {result['query_p95_ms']:>8.2f} "
+              f"{result['corpus_chunks_per_second']:>9.1f} {result['min_cosine']:>8.4f} {result['mean_cosine']:>8.4f} "
+              f"{result['top_k_overlap']:>6.2f}")
+
+    if results["onnx"]["min_cosine"] < PARITY_MIN_COSINE:
+        logging.error("Parity check failed: minimum cosine %.4f is below %.2f",
+                      results["onnx"]["min_cosine"], PARITY_MIN_COSINE)
+        sys.exit(1)
+    logging.info("Parity check passed")
@@ -0,0 +1,107 @@
+import os
+import logging
+import threading
+from typing import List, Tuple
+import tiktoken
+
+# Upper bound on prompt tokens spent on retrieved passages
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Passages that would get fewer tokens than this after truncation are left out
+MIN_PASSAGE_TOKENS = 50
+
+# Longest repeated text searched for between neighbouring chunks; covers chroma.CHUNK_OVERLAP
+MAX_OVERLAP_CHARS = 400
+
+_lock = threading.Lock()
+_encoding = None
+
+
+def get_encoding(model: str = "gpt-4o") -> tiktoken.Encoding:
+    """Return the tokenizer used by the chat model, loaded once per process"""
+    global _encoding
+    if _encoding is None:
+        with _lock:
+            if _encoding is None:
+                _encoding = tiktoken.encoding_for_model(model)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens the chat model will see for text"""
+    return len(get_encoding().encode(text))
+
+
+def _page_span(meta: dict) -> Tuple[int, int]:
+    if "page_start" in meta and "page_end" in meta:
+        return int(meta["page_start"]), int(meta["page_end"])
+    start, _, end = str(meta.get("page_range", "0-0")).partition("-")
+    return int(start or 0), int(end or start or 0)
+
+
+def _trim_overlap(previous: str, text: str) -> str:
+    """Drop the start of text if it repeats the end of previous (chunk overlap)"""
+    limit = min(len(previous), len(text), MAX_OVERLAP_CHARS)
+    for size in range(limit, 20, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+
+def select_passages(results: dict) -> List[Tuple[str, dict]]:
+    """Order retrieved passages by relevance and drop duplicate or overlapping text"""
+    documents = (results.get("documents") or [[]])[0] or []
+    metadatas = (results.get("metadatas") or [[]])[0] or [{}] * len(documents)
+    distances = (results.get("distances") or [[]])[0] or [0.0] * len(documents)
+
+    ranked = sorted(zip(documents, metadatas, distances), key=lambda item: item[2])
+    selected = []
+    for text, meta, _ in ranked:
+        text = " ".join((text or "").split())
+        if not text or any(text in kept for kept, _ in selected):
+            continue
+        start, end = _page_span(meta)
+        for kept, kept_meta in selected:
+            kept_start, kept_end = _page_span(kept_meta)
+            # Neighbouring chunks from the same pages share their overlap text
+            if kept_meta.get("source") == meta.get("source") and start <= kept_end and kept_start <= end:
+                text = _trim_overlap(kept, text)
+        if text:
+            selected.append((text, meta))
+    return selected
+
+
+def format_citation(number: int, meta: dict) -> str:
+    start, end = _page_span(meta)
+    pages = f"page {start}" if start == end else f"pages {start}-{end}"
+    return f"[{number}] {meta.get('source', 'unknown source')}, {pages}"
+
+
+def build_context(results: dict, token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, str, int]:
+    """Pack retrieved passages into at most token_budget tokens.
+
+    Returns the context block, the matching citation lines and the number of
+    tokens used. Passages are added in order of relevance; the last one that
+    does not fit whole is truncated if enough budget is left for it.
+    """
+    encoding = get_encoding()
+    passages = []
+    citations = []
+    used = 0
+    for text, meta in select_passages(results):
+        number = len(passages) + 1
+        header = f"[{number}] ({meta.get('source', 'unknown source')}, pages {meta.get('page_range', '?')})\n"
+        header_tokens = len(encoding.encode(header))
+        tokens = encoding.encode(text)
+        remaining = token_budget - used - header_tokens
+        if remaining < MIN_PASSAGE_TOKENS:
+            break
+        if len(tokens) > remaining:
+            text = encoding.decode(tokens[:remaining]) + " ..."
+            tokens = tokens[:remaining]
+        passages.append(header + text)
+        citations.append(format_citation(number, meta))
+        used += header_tokens + len(tokens)
+
+    logging.debug("Built context from %d passages in %d tokens", len(passages), used)
+    return "\n\n".join(passages), "\n".join(citations), used
@@ -0,0 +1,104 @@
+import os
+from typing import List
+from context_builder import get_encoding
+
+# What the chat model remembers of a conversation: the most recent turns, up
+# to MEMORY_WINDOW_TOKENS, plus a running summary of everything older. The
+# summary is only rewritten when turns fall out of the window, so the memory
+# sent with each question, and the prompt cost per turn, stays flat however
+# long the conversation gets.
+MEMORY_WINDOW_TOKENS = int(os.getenv("MEMORY_WINDOW_TOKENS", "800"))
+
+# Each remembered turn keeps at most this many tokens; long answers are cut
+MEMORY_TURN_TOKENS = int(os.getenv("MEMORY_TURN_TOKENS", "300"))
+
+# Upper bound on the running summary, used as max_tokens when it is rewritten
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation about the Indian Constitution.
+Update the summary with the conversation turns below. Keep the Articles, Parts, Schedules and
+Amendments discussed and what the user wanted to know. Reply with the summary only, in at most
+{words} words.
+
+Current summary:
+{summary}
+
+Turns to add:
+{turns}
+"""
+
+REWRITE_PROMPT = """Rewrite the user's latest question as a standalone question that can be understood
+without the conversation, resolving references such as "it", "that article" or "what about ...".
+Keep the language the question was asked in. If it is already standalone, repeat it unchanged.
+Reply with the question only.
+
+Conversation so far:
+{conversation}
+
+Latest question: {question}
+"""
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    tokens = get_encoding().encode(text)
+    if len(tokens) <= limit:
+        return text
+    return get_encoding().decode(tokens[:limit]) + " ..."
+
+
+def format_turns(turns: List[dict]) -> str:
+    return "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+
+
+class ConversationMemory:
+    """Token-bounded window of recent turns and a summary of older ones, kept per session"""
+
+    def __init__(self, window_tokens: int = MEMORY_WINDOW_TOKENS, turn_tokens: int = MEMORY_TURN_TOKENS):
+        self.window_tokens = window_tokens
+        self.turn_tokens = turn_tokens
+        self.summary = ""
+        self.turns: List[dict] = []
+
+    def is_empty(self) -> bool:
+        return not self.summary and not self.turns
+
+    def window_size(self) -> int:
+        """Tokens held by the turns in the window"""
+        return sum(turn["tokens"] for turn in self.turns)
+
+    def add_turn(self, role: str, content: str) -> List[dict]:
+        """Remember a turn; returns the oldest turns it pushed out of the window, oldest first.
+
+        The caller folds the returned turns into the summary. The newest
+        question and answer always stay in the window.
+        """
+        content = truncate_tokens(content, self.turn_tokens)
+        self.turns.append({"role": role, "content": content, "tokens": len(get_encoding().encode(content))})
+        evicted = []
+        while len(self.turns) > 2 and self.window_size() > self.window_tokens:
+            evicted.append(self.turns.pop(0))
+        return evicted
+
+    def messages(self) -> List[dict]:
+        """Chat messages carrying the memory, to go between the system prompt and the question"""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        messages.extend({"role": turn["role"], "content": turn["content"]} for turn in self.turns)
+        return messages
+
+    def transcript(self) -> str:
+        """The memory as plain text, for prompts that rewrite questions"""
+        parts = [f"(Earlier: {self.summary})"] if self.summary else []
+        parts.append(format_turns(self.turns))
+        return "\n".join(part for part in parts if part)
+
+    def summary_messages(self, evicted: List[dict]) -> List[dict]:
+        """Messages asking the chat model to fold evicted turns into the summary"""
+        return [{"role": "user", "content": SUMMARY_PROMPT.format(
+            words=MEMORY_SUMMARY_TOKENS * 3 // 4, summary=self.summary or "(none yet)", turns=format_turns(evicted)
+        )}]
+
+    def rewrite_messages(self, question: str) -> List[dict]:
+        """Messages asking the chat model to make question standalone using this memory"""
+        return [{"role": "user", "content": REWRITE_PROMPT.format(conversation=self.transcript(), question=question)}]
@@ -0,0 +1,41 @@
+import os
+import logging
+import argparse
+import resources
+from embedding_backends import local_model_path, export_quantized_model, EMBEDDING_MODEL_DIR
+from context_builder import get_encoding
+
+logging.basicConfig(level=logging.INFO)
+
+
+def download_models(model_names: list, onnx: bool = False):
+    """Save embedding models under EMBEDDING_MODEL_DIR and fetch the chat tokenizer.
+
+    Run at image build time so the app never downloads anything at startup.
+    The tokenizer is cached wherever TIKTOKEN_CACHE_DIR points.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    for model_name in model_names:
+        path = local_model_path(model_name)
+        if os.path.isfile(os.path.join(path, "modules.json")):
+            logging.info("%s is already saved in %s", model_name, path)
+        else:
+            logging.info("Saving %s to %s", model_name, path)
+            SentenceTransformer(model_name, device="cpu").save(path)
+        if onnx:
+            export_quantized_model(model_name)
+
+    if not os.getenv("TIKTOKEN_CACHE_DIR"):
+        logging.warning("TIKTOKEN_CACHE_DIR is not set; the tokenizer is cached in a temporary directory")
+    get_encoding()
+    logging.info("Models saved to %s", EMBEDDING_MODEL_DIR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the models the app needs so it can start offline")
+    parser.add_argument("--model", action="append", dest="models",
+                        help=f"Embedding model to save; repeatable (default: {resources.EMBEDDING_MODEL})")
+    parser.add_argument("--onnx", action="store_true", help="Also export the quantized ONNX version of each model")
+    args = parser.parse_args()
+    download_models(args.models or [resources.EMBEDDING_MODEL], onnx=args.onnx)
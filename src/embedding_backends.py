@@ -0,0 +1,109 @@
+import os
+import glob
+import logging
+import threading
+from typing import Any, Dict, Tuple
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+# Which runtime computes embeddings: "torch" runs the full-precision PyTorch
+# model, "onnx" an ONNX export with int8 dynamically quantized weights, which
+# is considerably cheaper on CPU-only hosts. The ONNX backend needs
+# `pip install sentence-transformers[onnx]`.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+# Instruction set the quantized model is tuned for: arm64, avx2, avx512 or avx512_vnni
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./.cache/onnx")
+
+# Models found here (saved by download_models.py, e.g. baked into the Docker
+# image) are loaded from disk instead of the Hugging Face hub
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "./models")
+
+_lock = threading.Lock()
+_models: Dict[Tuple[str, str], object] = {}
+
+
+def local_model_path(model_name: str) -> str:
+    """Directory a model is saved to under EMBEDDING_MODEL_DIR"""
+    return os.path.join(EMBEDDING_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def resolve_model_path(model_name: str) -> str:
+    """The bundled local copy of model_name if there is one, otherwise the name itself"""
+    path = local_model_path(model_name)
+    return path if os.path.isfile(os.path.join(path, "modules.json")) else model_name
+
+
+def _quantized_file(model_dir: str, quantization: str):
+    """Path of the quantized ONNX file in model_dir relative to it, or None if not exported yet"""
+    matches = glob.glob(os.path.join(model_dir, "onnx", f"model_*_{quantization}.onnx"))
+    return os.path.relpath(matches[0], model_dir) if matches else None
+
+
+def export_quantized_model(model_name: str, quantization: str = ONNX_QUANTIZATION) -> Tuple[str, str]:
+    """Export model_name to ONNX and quantize its weights to int8, once.
+
+    Returns the local model directory and the quantized file inside it.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+    file_name = _quantized_file(model_dir, quantization)
+    if file_name is None:
+        logging.info("Exporting %s to ONNX with %s int8 quantization in %s", model_name, quantization, model_dir)
+        model = SentenceTransformer(resolve_model_path(model_name), device="cpu", backend="onnx")
+        model.save_pretrained(model_dir)
+        export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+        file_name = _quantized_file(model_dir, quantization)
+        if file_name is None:
+            raise FileNotFoundError(f"Quantized ONNX model for {model_name} not found in {model_dir}")
+    return model_dir, file_name
+
+
+def load_sentence_transformer(model_name: str, backend: str = EMBEDDING_BACKEND):
+    """Return the SentenceTransformer for model_name on the given backend, loaded once per process"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
+    key = (model_name, backend)
+    if key not in _models:
+        with _lock:
+            if key not in _models:
+                from sentence_transformers import SentenceTransformer
+                if backend == "onnx":
+                    model_dir, file_name = export_quantized_model(model_name)
+                    _models[key] = SentenceTransformer(
+                        model_dir, device="cpu", backend="onnx", model_kwargs={"file_name": file_name}
+                    )
+                else:
+                    _models[key] = SentenceTransformer(resolve_model_path(model_name), device="cpu")
+    return _models[key]
+
+
+class BackendEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """Chroma's sentence-transformer embedding function on a selectable backend.
+
+    The parent caches models by name only, which would hand the PyTorch model
+    to an ONNX caller, so models come from load_sentence_transformer instead.
+    The persisted configuration is the parent's, so collections built with
+    one backend can be queried with the other. Chroma rebuilds the function
+    from that configuration, e.g. in create_collection, so build_from_config
+    is overridden too: the parent's would load a second PyTorch model by hub
+    name, ignoring EMBEDDING_BACKEND and EMBEDDING_MODEL_DIR.
+    """
+
+    def __init__(self, model_name: str, backend: str = EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.device = "cpu"
+        self.normalize_embeddings = False
+        self.kwargs = {}
+        self.backend = backend
+        self._model = load_sentence_transformer(model_name, backend)
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "BackendEmbeddingFunction":
+        """The function for a persisted configuration, on the configured backend and model copy"""
+        return BackendEmbeddingFunction(config["model_name"])
+
+    def is_legacy(self) -> bool:
+        return False
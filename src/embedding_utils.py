@@ -0,0 +1,70 @@
+import os
+import time
+import logging
+from typing import List
+import numpy as np
+from chroma_utils import EMBEDDING_MODEL
+from embedding_backends import load_sentence_transformer, EMBEDDING_BACKEND
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+
+
+class EmbeddingStage:
+    """Encodes document chunks for index builds.
+
+    Texts are sorted by length before batching so each batch pads to similar
+    lengths, and with workers > 1 they are encoded by a sentence-transformers
+    multi-process pool. Vectors match the ones Chroma's
+    SentenceTransformerEmbeddingFunction would compute for the same model.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = EMBED_BATCH_SIZE,
+                 workers: int = EMBED_WORKERS, backend: str = EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.model = load_sentence_transformer(model_name, backend)
+        self.pool = None
+        self.chunks = 0
+        self.seconds = 0.0
+        if workers > 1:
+            self.pool = self.model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning vectors in the same order as the input"""
+        if not texts:
+            return []
+        start = time.perf_counter()
+
+        # Longest first, so batches hold texts of similar length and waste little padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        sorted_texts = [texts[i] for i in order]
+        if self.pool is not None:
+            vectors = self.model.encode(
+                sorted_texts,
+                batch_size=self.batch_size,
+                pool=self.pool,
+                chunk_size=max(self.batch_size, len(sorted_texts) // (self.workers * 4) + 1)
+            )
+        else:
+            vectors = self.model.encode(sorted_texts, batch_size=self.batch_size, convert_to_numpy=True)
+
+        embeddings = np.empty_like(vectors)
+        embeddings[order] = vectors
+
+        seconds = time.perf_counter() - start
+        self.chunks += len(texts)
+        self.seconds += seconds
+        logging.info("Embedded %d chunks in %.2fs (%.1f chunks/s)", len(texts), seconds, len(texts) / seconds)
+        return embeddings.tolist()
+
+    def throughput(self) -> float:
+        """Chunks per second over every encode call so far"""
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        """Stop the worker pool, if any"""
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
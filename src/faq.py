@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+import threading
+from typing import Optional
+import resources
+from response_utils import MODEL, PROMPT_VERSION
+
+# Output languages offered in the sidebar; names match the keys of chroma.LANGUAGE_PDFS
+LANGUAGES = ["English", "Hindi", "Telugu", "Tamil", "Marathi", "Gujarati", "Kannada", "Malayalam"]
+
+# FAQ lists
+constitution_faq = [
+    "What are the fundamental rights provided by the Indian Constitution?",
+    "What is the Preamble to the Indian Constitution, and what does it signify?",
+    "How does the Indian Constitution define the territories of India?",
+    "What provisions does the Indian Constitution make regarding citizenship?",
+    "What are the Directive Principles of State Policy in the Indian Constitution?",
+    "What is the amendment process in the Indian Constitution?",
+    "How is the President of India elected, and what are the President's powers and duties?",
+    "What are the emergency provisions stated in the Indian Constitution?",
+    "What is the significance of the Ninth Schedule in the Indian Constitution?",
+    "How are the states formed or reorganized under the Indian Constitution?"
+]
+
+amendment_faq = [
+    "What were the key changes introduced by the 42nd Amendment Act of 1976?",
+    "How did the 44th Amendment Act of 1978 alter the Emergency provisions?",
+    "What was the significance of the 73rd Amendment Act of 1992?",
+    "How did the 101st Amendment Act of 2016 implement GST?",
+    "What were the objectives of the 24th Amendment Act of 1971?",
+    "How did the 86th Amendment Act of 2002 impact education?",
+    "What is the Anti-Defection Law (52nd Amendment Act of 1985)?",
+    "How did the 61st Amendment Act of 1988 change voting rights?",
+    "What were the key provisions of the 97th Amendment Act of 2011?",
+    "What did the 54th Amendment Act of 1986 change about official salaries?"
+]
+
+# Answers for every FAQ x language pair, generated by precompute_faq.py
+FAQ_ANSWERS_PATH = os.getenv("FAQ_ANSWERS_PATH", "./chroma_db/faq_answers.json")
+
+_lock = threading.Lock()
+_precomputed = None
+
+
+def artifact_matches(artifact: dict, index_version: Optional[str] = None) -> bool:
+    """Check whether a FAQ artifact was built for the index, prompt and models in use.
+
+    index_version is chroma.index_version(), the fingerprint of the source
+    PDFs; it is only checked when given, because computing it imports
+    chroma. The built index itself is always checked, through the hash of
+    its manifest.
+    """
+    return (
+        (index_version is None or artifact.get("index_version") == index_version)
+        and artifact.get("manifest_version") == resources.get_index_version()
+        and artifact.get("prompt_version") == PROMPT_VERSION
+        and artifact.get("model") == MODEL
+        and artifact.get("embedding_model") == resources.EMBEDDING_MODEL
+        and artifact.get("unified_index") == resources.UNIFIED_INDEX
+    )
+
+
+def load_precomputed_answers(path: str = FAQ_ANSWERS_PATH) -> dict:
+    """Load the precomputed FAQ artifact once per process.
+
+    An artifact generated for another index, prompt, model or embedding
+    model is ignored, so stale answers are never served.
+    """
+    global _precomputed
+    if _precomputed is None:
+        with _lock:
+            if _precomputed is None:
+                answers = {}
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        artifact = json.load(f)
+                    if artifact_matches(artifact):
+                        answers = artifact.get("answers", {})
+                    else:
+                        logging.warning(
+                            "Ignoring %s: built for another index, prompt or model; run precompute_faq.py", path
+                        )
+                except FileNotFoundError:
+                    logging.warning("Precomputed FAQ answers not found: %s", path)
+                except (OSError, ValueError) as e:
+                    logging.error(f"Error loading precomputed FAQ answers: {str(e)}")
+                _precomputed = answers
+    return _precomputed
+
+
+def reset_precomputed_answers():
+    """Forget the loaded artifact, so the next lookup loads and checks it again"""
+    global _precomputed
+    with _lock:
+        _precomputed = None
+
+
+def get_precomputed_answer(question: str, language: str) -> Optional[str]:
+    """Return the precomputed answer for an FAQ question, if there is one"""
+    entry = load_precomputed_answers().get(language, {}).get(question)
+    return entry["answer"] if entry else None
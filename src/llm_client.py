@@ -0,0 +1,188 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Iterator, List, Optional
+import httpx
+import openai
+from openai import AsyncAzureOpenAI
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+# Errors worth another attempt: throttling, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call did not complete before its deadline, retries included"""
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested wait from retry-after-ms or Retry-After (seconds or HTTP date)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def backoff_seconds(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AsyncLLMClient:
+    """Azure OpenAI chat client running on a private event loop.
+
+    One AsyncAzureOpenAI client and its pooled HTTP connections are shared by
+    every caller in the process. Each call has an overall deadline, and
+    throttled or failed attempts are retried with jittered exponential
+    backoff, waiting at least as long as the server's Retry-After asks.
+    The *_sync methods let Streamlit script threads use it without blocking
+    each other on one slow request.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, api_version: Optional[str] = None,
+                 azure_endpoint: Optional[str] = None, timeout: float = LLM_TIMEOUT_SECONDS,
+                 deadline: float = LLM_DEADLINE_SECONDS, max_retries: int = LLM_MAX_RETRIES,
+                 max_connections: int = LLM_MAX_CONNECTIONS):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.retries = 0
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-client-loop", daemon=True)
+        self._thread.start()
+
+        async def create_client():
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0))
+            )
+            return AsyncAzureOpenAI(
+                api_key=api_key or os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=api_version or os.getenv("AZURE_OPENAI_API_VERSION"),
+                azure_endpoint=azure_endpoint or os.getenv("AZURE_OPENAI_ENDPOINT"),
+                http_client=http_client,
+                max_retries=0  # Retries are handled here so Retry-After and the deadline are honored
+            )
+
+        self.client = asyncio.run_coroutine_threadsafe(create_client(), self.loop).result()
+
+    async def _wait_before_retry(self, attempt: int, error: Exception, give_up_at: float):
+        delay = max(backoff_seconds(attempt), retry_after_seconds(error) or 0.0)
+        if time.monotonic() + delay >= give_up_at:
+            raise DeadlineExceeded(f"Deadline exceeded after {attempt + 1} attempts: {str(error)}") from error
+        self.retries += 1
+        logging.warning("LLM call failed (%s), retrying in %.2fs", type(error).__name__, delay)
+        await asyncio.sleep(delay)
+
+    async def complete(self, messages: List[dict], model: str, max_tokens: int,
+                       deadline: Optional[float] = None) -> str:
+        """Return the full completion text"""
+        give_up_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            remaining = give_up_at - time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=model, messages=messages, max_tokens=max_tokens, timeout=min(self.timeout, remaining)
+                    ),
+                    timeout=remaining
+                )
+                return response.choices[0].message.content
+            except asyncio.TimeoutError as e:
+                raise DeadlineExceeded("Deadline exceeded waiting for the LLM") from e
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                await self._wait_before_retry(attempt, e, give_up_at)
+                attempt += 1
+
+    async def stream(self, messages: List[dict], model: str, max_tokens: int,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield completion tokens as they arrive.
+
+        Failures before the first token are retried; once tokens have been
+        yielded the error is raised, since the caller has already shown them.
+        """
+        give_up_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            started = False
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=model, messages=messages, max_tokens=max_tokens, stream=True,
+                        timeout=min(self.timeout, give_up_at - time.monotonic())
+                    ),
+                    timeout=give_up_at - time.monotonic()
+                )
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=give_up_at - time.monotonic())
+                    except StopAsyncIteration:
+                        return
+                    # Azure sends content-filter results as chunks without choices
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    started = True
+                    yield chunk.choices[0].delta.content
+            except asyncio.TimeoutError as e:
+                raise DeadlineExceeded("Deadline exceeded waiting for the LLM") from e
+            except RETRYABLE_ERRORS as e:
+                if started or attempt >= self.max_retries:
+                    raise
+                await self._wait_before_retry(attempt, e, give_up_at)
+                attempt += 1
+
+    def complete_sync(self, messages: List[dict], model: str, max_tokens: int,
+                      deadline: Optional[float] = None) -> str:
+        """Blocking wrapper around complete() for Streamlit script threads"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.complete(messages, model, max_tokens, deadline), self.loop
+        )
+        return future.result()
+
+    def stream_sync(self, messages: List[dict], model: str, max_tokens: int,
+                    deadline: Optional[float] = None) -> Iterator[str]:
+        """Blocking iterator over stream() for Streamlit script threads"""
+        tokens = self.stream(messages, model, max_tokens, deadline)
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(tokens.__anext__(), self.loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe(tokens.aclose(), self.loop).result()
+
+    def close(self):
+        """Close pooled connections and stop the event loop"""
+        asyncio.run_coroutine_threadsafe(self.client.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+import resources
+from benchmark import faq_workload, paraphrase_workload, summarize
+from faq import constitution_faq, amendment_faq
+from response_utils import BUSY_MESSAGE
+from process_stats import resident_memory_bytes, format_bytes
+from stub_llm_server import StubLLMServer
+
+# Capacity test for one app process: N headless Streamlit sessions (AppTest)
+# run main.py concurrently in this process, the way one `streamlit run`
+# server runs every session's script on its own thread. Each session
+# alternates think time with an interaction, either typing a question into
+# the chat input or clicking a sidebar FAQ button. Answers come from
+# StubLLMServer. For each concurrency level the harness reports throughput,
+# latency percentiles, CPU and RSS, and then names the saturation point.
+#
+#   python src/load_test.py --concurrency 1,2,4,8,16 --duration 60 --think-time 2
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Going up a level must raise throughput by at least this fraction, or the previous level was saturation
+SATURATION_MIN_GAIN = 0.10
+
+# Seconds between CPU and memory samples
+SAMPLE_INTERVAL = 0.5
+
+
+@contextmanager
+def concurrent_app_tests():
+    """Let AppTest sessions run at the same time in one process.
+
+    Every AppTest run registers a mock Runtime singleton and clears it when
+    the run finishes, which breaks runs still going on other threads. While
+    this is active the last registered runtime stays available. The testing
+    config is also patched for the whole test rather than per run, since
+    nested per-thread patches would restore each other out of order.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1.util import patch_config_options
+
+    original_instance, original_exists = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+    registered = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            registered["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" not in registered:
+            raise RuntimeError("Runtime hasn't been created!")
+        return registered["runtime"]
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in registered
+
+    Runtime.instance, Runtime.exists = classmethod(instance), classmethod(exists)
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        Runtime.instance, Runtime.exists = original_instance, original_exists
+
+
+class Session:
+    """One simulated user driving main.py through the chat input and the FAQ buttons"""
+
+    def __init__(self, session_id: int, questions: List[str], think_time: float, faq_ratio: float,
+                 timeout: float = 120):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.questions = questions
+        self.think_time = think_time
+        self.faq_ratio = faq_ratio
+        self.rng = random.Random(session_id)
+        self.app = AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+        self.interactions = []
+
+    def _timed(self, action: str, interact):
+        start = time.perf_counter()
+        try:
+            interact()
+            messages = self.app.session_state["messages"] if "messages" in self.app.session_state else []
+            last = messages[-1]["content"] if messages else ""
+            error = bool(self.app.exception) or last.startswith("An error occurred")
+            shed = last == BUSY_MESSAGE
+        except Exception as e:
+            logging.error(f"Error in session {self.session_id}: {str(e)}")
+            error, shed = True, False
+        self.interactions.append({"action": action, "latency": time.perf_counter() - start, "error": error,
+                                  "shed": shed})
+
+    def open(self):
+        self._timed("page_load", self.app.run)
+
+    def ask(self):
+        question = self.rng.choice(self.questions)
+        self._timed("chat", lambda: self.app.chat_input[0].set_value(question).run())
+
+    def click_faq(self):
+        prefix, faq_list = self.rng.choice((("const", constitution_faq), ("amend", amendment_faq)))
+        question = self.rng.choice(faq_list)
+        self._timed("faq", lambda: self.app.button(key=f"{prefix}_{question}").click().run())
+
+    def run_until(self, deadline: float):
+        """Open the page, then think and interact until the deadline passes"""
+        self.open()
+        while True:
+            pause = self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0
+            if time.perf_counter() + pause >= deadline:
+                break
+            time.sleep(pause)
+            if self.rng.random() < self.faq_ratio:
+                self.click_faq()
+            else:
+                self.ask()
+
+
+class ResourceSampler:
+    """Samples this process's CPU use and resident memory in a background thread"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.rss = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.rss.append(resident_memory_bytes())
+
+    def __enter__(self) -> "ResourceSampler":
+        self.start_wall, self.start_cpu = time.perf_counter(), self._cpu_seconds()
+        self.rss.append(resident_memory_bytes())
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.rss.append(resident_memory_bytes())
+        self.wall = time.perf_counter() - self.start_wall
+        self.cpu = self._cpu_seconds() - self.start_cpu
+
+    def summary(self) -> dict:
+        return {
+            "cpu_percent": 100 * self.cpu / self.wall if self.wall else 0.0,
+            "rss_peak_bytes": max(self.rss),
+            "rss_end_bytes": self.rss[-1],
+        }
+
+
+def run_level(concurrency: int, duration: float, questions: List[str], think_time: float,
+              faq_ratio: float) -> dict:
+    """Run concurrency sessions for duration seconds and summarize their interactions"""
+    sessions = [Session(i, questions, think_time, faq_ratio) for i in range(concurrency)]
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=session.run_until, args=(deadline,), name=f"session-{session.session_id}")
+        for session in sessions
+    ]
+    with ResourceSampler() as sampler:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Page loads are one-off; throughput and latency cover the questions that were served
+    questions_asked = [item for session in sessions for item in session.interactions if item["action"] != "page_load"]
+    interactions = [item for item in questions_asked if not item["shed"]]
+    by_action = {}
+    for item in interactions:
+        by_action.setdefault(item["action"], []).append(item["latency"])
+    return dict(
+        summarize([item["latency"] for item in interactions], sampler.wall),
+        concurrency=concurrency,
+        errors=sum(item["error"] for item in interactions),
+        shed=len(questions_asked) - len(interactions),
+        actions={action: summarize(latencies, sampler.wall) for action, latencies in by_action.items()},
+        **sampler.summary()
+    )
+
+
+def find_saturation(levels: List[dict], min_gain: float = SATURATION_MIN_GAIN,
+                    max_p95_seconds: Optional[float] = None) -> Optional[dict]:
+    """The first level where throughput stopped growing or p95 latency broke the limit.
+
+    Returns None when every level still scaled. The level before the
+    returned one is the highest concurrency the process sustains.
+    """
+    for previous, level in zip(levels, levels[1:]):
+        if not level.get("count"):
+            return level
+        if level["throughput_per_s"] < previous.get("throughput_per_s", 0) * (1 + min_gain):
+            return level
+        if max_p95_seconds is not None and level["p95_ms"] > max_p95_seconds * 1000:
+            return level
+    return None
+
+
+def warm_up(questions: List[str]):
+    """Load shared resources and run one session serially before measuring"""
+    resources.startup()
+    session = Session(-1, questions, think_time=0, faq_ratio=0)
+    session.open()
+    session.ask()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Find how many concurrent sessions one app process can serve")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated session counts to test")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run each concurrency level")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between a session's interactions")
+    parser.add_argument("--faq-ratio", type=float, default=0.3, help="Fraction of interactions that click a FAQ button")
+    parser.add_argument("--stub-first-token-latency", type=float, default=0.5)
+    parser.add_argument("--stub-token-latency", type=float, default=0.02)
+    parser.add_argument("--stub-answer-tokens", type=int, default=50)
+    parser.add_argument("--max-p95", type=float, help="p95 latency limit in seconds for the saturation point")
+    parser.add_argument("--with-answer-cache", action="store_true", help="Keep the semantic answer cache on")
+    parser.add_argument("--with-admission-control", action="store_true",
+                        help="Keep admission control on; questions it sheds are counted apart from throughput")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(first_token_latency=args.stub_first_token_latency, token_latency=args.stub_token_latency,
+                         answer_tokens=args.stub_answer_tokens).start()
+    os.environ["AZURE_OPENAI_ENDPOINT"] = stub.url
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-06-01")
+    # Keep the metrics server of the app under test off
+    os.environ.setdefault("METRICS_PORT", "0")
+
+    import response_utils
+    if not args.with_answer_cache:
+        response_utils.ANSWER_CACHE_ENABLED = False
+    if not args.with_admission_control:
+        # Otherwise the LLM quota, not the process, sets the saturation point
+        response_utils.ADMISSION_CONTROL = False
+
+    # Other modules configure INFO logging on import; per-request logs would bury the table
+    logging.getLogger().setLevel(logging.WARNING)
+    # Creating AppTest sessions outside a script run warns once per session; Streamlit
+    # resets its loggers' levels when it loads its config, so filter instead
+    import streamlit.runtime.scriptrunner_utils.script_run_context as script_run_context
+    logging.getLogger(script_run_context.__name__).addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage()
+    )
+
+    questions = faq_workload() + paraphrase_workload(faq_workload())
+    levels = []
+    try:
+        with concurrent_app_tests():
+            warm_up(questions)
+            print(f"{'sessions':>8} {'done':>6} {'errors':>6} {'shed':>6} {'per s':>7} {'p50 ms':>9} {'p95 ms':>9} "
+                  f"{'p99 ms':>9} {'cpu %':>7} {'peak rss':>10}")
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                level = run_level(concurrency, args.duration, questions, args.think_time, args.faq_ratio)
+                levels.append(level)
+                print(f"{concurrency:>8} {level['count']:>6} {level['errors']:>6} {level['shed']:>6} "
+                      f"{level.get('throughput_per_s', 0):>7.2f} {level.get('p50_ms', 0):>9.0f} "
+                      f"{level.get('p95_ms', 0):>9.0f} {level.get('p99_ms', 0):>9.0f} "
+                      f"{level['cpu_percent']:>7.0f} {format_bytes(level['rss_peak_bytes']):>10}")
+    finally:
+        stub.stop()
+
+    saturated = find_saturation(levels, max_p95_seconds=args.max_p95)
+    if saturated is None:
+        print(f"No saturation up to {levels[-1]['concurrency']} sessions; try higher concurrency")
+    else:
+        index = levels.index(saturated)
+        sustained = levels[index - 1]["concurrency"] if index else 0
+        print(f"Saturated at {saturated['concurrency']} sessions; "
+              f"{sustained} sessions is the highest level that still scaled")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": vars(args),
+                "levels": levels,
+                "saturation_concurrency": saturated["concurrency"] if saturated else None,
+            }, f, indent=2)
@@ -1,12 +1,17 @@
 import streamlit as st
 import os
 import logging
+import threading
 from typing import List
-import base64
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from common_settings import set_page_container_style, hide_streamlit_header_footer
-from chroma_utils import ChromaDBClient
-from openai import AzureOpenAI  
+import resources
+import telemetry
+import static_assets
+from response_utils import generate_response, stream_response, remember, STREAM_RESPONSES
+from conversation_memory import ConversationMemory
+from faq import LANGUAGES, constitution_faq, amendment_faq, get_precomputed_answer
 
 # Set up logging for debugging
 logging.basicConfig(level=logging.ERROR)
@@ -14,34 +19,25 @@ logging.basicConfig(level=logging.ERROR)
 # Load environment variables
 load_dotenv()
 
-MODEL = "gpt-4o"
-TEMPERATURE=0.7,
-MAX_TOKENS=500
+# Show the stage-by-stage timing of the last answer in the sidebar
+SHOW_DEBUG_PANEL = os.getenv("SHOW_DEBUG_PANEL", "false").lower() == "true"
 
-# Initialize OpenAI
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-LANGUAGE=""
-
-# Create prompt for OpenAI
-system_prompt = f"""You are an expert on the Indian Constitution. Answer questions in {LANGUAGE} 
-using only the following context. Include relevant citations from the context in your answer.
+# A rerun draws only the latest CHAT_HISTORY_PAGE_SIZE messages of the chat history; older ones
+# are shown a page at a time on request. 0 always draws the whole history.
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "20"))
 
-Context:
-{{context}}
+# Serve the page's images as cached static files built by src/static_assets.py instead of inlining them
+STATIC_ASSETS = os.getenv("STATIC_ASSETS", "true").lower() == "true"
 
-Citations format:
-{{citations}}
+AVATARS = {"assistant": "1.png", "user": "chat_avatar.png"}
 
-Make sure the answers are eloborate and factually correct. 
+# Load shared resources once per server process in the background, so this page
+# renders while they warm up; later reruns reuse them. Under serve.py they are
+# already loaded.
+resources.start_background_startup()
 
-Please format your response with citations at the end, referencing specific sections and page numbers.
-"""
-# Initialize ChromaDB client
-chroma_client = ChromaDBClient(persist_directory="./chroma_db")
+# Prometheus metrics on METRICS_PORT, served once per process
+telemetry.start_metrics_server()
 
 # Streamlit page configuration
 st.set_page_config(
@@ -51,17 +47,19 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Function to encode images as base64
-def get_img_as_base64(file):
-    with open(file, "rb") as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
+# Image sources and CSS are resolved once per server process, not read and encoded on every rerun
+@st.cache_resource(show_spinner=False)
+def get_page_assets(static: bool) -> dict:
+    return static_assets.page_assets(static)
+
+assets = get_page_assets(STATIC_ASSETS)
+
+def get_avatar(role: str) -> str:
+    return assets["images"][AVATARS[role]]
 
-# Load and apply background image
-bg_img = get_img_as_base64("src/images/BG.png")
-with open("styles.css") as f:
-    css = f.read().replace("{bg_img}", bg_img)
-    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+# Apply the page CSS with its background image. Streamlit drops elements a rerun does not
+# send again, so this is sent every time; it is a few hundred bytes once the image is static.
+st.markdown(f"<style>{assets['css']}</style>", unsafe_allow_html=True)
 
 # Apply page container style
 set_page_container_style(
@@ -86,13 +84,15 @@ with col2:
 # Reset chat if button clicked
 if reset_button:
     st.session_state.messages = []
+    st.session_state.memory = ConversationMemory()
+    st.session_state.history_pages = 1
 
 # Header content
 with col1:
     st.markdown(
         f'''
         <div style="display: flex; align-items: center;">
-            <img src="data:image/png;base64,{get_img_as_base64('src/images/3.png')}" 
+            <img src="{assets['images']['3.png']}" 
                  style="width: 70px; height: 70px; margin-right: 10px;">
             <p style="color:#0A2081;font-size:30px;font-weight:bold;margin-top:0px;margin-bottom:0px;">
                 Indian Constitution & Amendment Acts AI Chatbot
@@ -124,48 +124,25 @@ if "openai_model" not in st.session_state:
     st.session_state.openai_model = "gpt-4"
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
 if "faq_question" not in st.session_state:
     st.session_state.faq_question = None
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
 
 # Sidebar content
-st.sidebar.image("src/images/2.png", width=250)
+st.sidebar.image(assets["images"]["2.png"], width=250)
 st.sidebar.markdown("<h3 style='color: #0A2081;'>Choose the output language:</h3>", unsafe_allow_html=True)
 
 # Language selection
 with st.sidebar:
     LANGUAGE = st.selectbox(
         "options",
-        ["English", "Hindi", "Telugu", "Tamil", "Marathi", "Gujarathi", "Kannada", "Malayalam"],
+        LANGUAGES,
         label_visibility="collapsed"
     )
 
-# FAQ lists
-constitution_faq = [
-    "What are the fundamental rights provided by the Indian Constitution?",
-    "What is the Preamble to the Indian Constitution, and what does it signify?",
-    "How does the Indian Constitution define the territories of India?",
-    "What provisions does the Indian Constitution make regarding citizenship?",
-    "What are the Directive Principles of State Policy in the Indian Constitution?",
-    "What is the amendment process in the Indian Constitution?",
-    "How is the President of India elected, and what are the President's powers and duties?",
-    "What are the emergency provisions stated in the Indian Constitution?",
-    "What is the significance of the Ninth Schedule in the Indian Constitution?",
-    "How are the states formed or reorganized under the Indian Constitution?"
-]
-
-amendment_faq = [
-    "What were the key changes introduced by the 42nd Amendment Act of 1976?",
-    "How did the 44th Amendment Act of 1978 alter the Emergency provisions?",
-    "What was the significance of the 73rd Amendment Act of 1992?",
-    "How did the 101st Amendment Act of 2016 implement GST?",
-    "What were the objectives of the 24th Amendment Act of 1971?",
-    "How did the 86th Amendment Act of 2002 impact education?",
-    "What is the Anti-Defection Law (52nd Amendment Act of 1985)?",
-    "How did the 61st Amendment Act of 1988 change voting rights?",
-    "What were the key provisions of the 97th Amendment Act of 2011?",
-    "What did the 54th Amendment Act of 1986 change about official salaries?"
-]
-
 # Function to display FAQ buttons
 def display_faq(faq_list, prefix):
     for question in faq_list:
@@ -205,76 +182,127 @@ with st.sidebar:
         )
         st.markdown("Created by [Chocolateminds](https://www.chocolateminds.com/).")
 
-def generate_response(prompt: str, language: str) -> str:
-    """Generate response using ChromaDB and OpenAI"""
-    try:
-        # Query ChromaDB for relevant context
-        collection_name = f"constitution_{language.lower()}"
-        results = chroma_client.query_collection(
-            collection_name=collection_name,
-            query_text=prompt
-        )
-
-        # Prepare context from retrieved documents
-        # context = "\n".join([doc for doc in results['documents'][0]])
-        # citations = [meta for meta in results['metadatas'][0]]
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
-
-        # Get response from OpenAI using the new client
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            max_tokens=MAX_TOKENS
-        )
+def queue_notifier(placeholder):
+    """Queue-position callback that shows the request's place in line in placeholder.
+
+    Streamed answers wait for the chat model on a worker thread, so the
+    callback attaches this script run's context to whichever thread calls it.
+    """
+    ctx = get_script_run_ctx()
+
+    def on_queue(position):
+        if get_script_run_ctx(suppress_warning=True) is None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        if position is None:
+            placeholder.empty()
+        elif position == 0:
+            placeholder.info("Many people are asking questions right now. Yours is next in line...")
+        else:
+            placeholder.info(f"Many people are asking questions right now. "
+                             f"{position} question{'s' if position > 1 else ''} ahead of yours...")
+
+    return on_queue
+
+def respond(prompt: str, language: str):
+    """Render the assistant reply to prompt and record it in the chat history"""
+    session_id = get_script_run_ctx().session_id
+    memory = st.session_state.memory
+    with telemetry.trace("respond", language, streamed=STREAM_RESPONSES) as trace:
+        if not resources.is_ready():
+            with telemetry.span("wait_for_startup"), st.spinner("Starting up..."):
+                resources.wait_until_ready()
+
+        outcome = {}
+        if STREAM_RESPONSES:
+            timings = {}
+            with telemetry.span("render"), st.chat_message("assistant", avatar=get_avatar("assistant")):
+                on_queue = queue_notifier(st.empty())
+                response = st.write_stream(
+                    stream_response(prompt, language, timings, session_id, on_queue, memory, outcome)
+                )
+            st.session_state.last_response_timings = timings
+        else:
+            on_queue = queue_notifier(st.empty())
+            with st.spinner("Generating response..."):  # Spinner starts here
+                response = generate_response(prompt, language, session_id, on_queue, memory, outcome)
+            # Spinner ends here
+            with telemetry.span("render"), st.chat_message("assistant", avatar=get_avatar("assistant")):
+                st.markdown(response, unsafe_allow_html=True)
+
+        # A shed or failed turn, possibly a partial answer plus the error, is not part of the conversation
+        if not outcome["failed"]:
+            remember(memory, prompt, response, session_id)
 
-        return response.choices[0].message.content
-
-    except Exception as e:
-        logging.error(f"Error generating response: {str(e)}")
-        return f"An error occurred: {str(e)}"
+    st.session_state.messages.append({"role": "assistant", "content": response})
+    st.session_state.last_trace = trace.to_dict()
+
+def show_debug_panel():
+    """Sidebar table of where the time went in the last answer of this session"""
+    last_trace = st.session_state.get("last_trace")
+    with st.sidebar.expander("Debug: last answer", expanded=False):
+        if last_trace is None:
+            st.caption("No answer yet.")
+            return
+        st.caption(f"{last_trace['name']}: {last_trace['duration_ms']:.0f} ms")
+        st.dataframe(telemetry.flatten(last_trace), hide_index=True)
+
+def show_earlier_messages():
+    st.session_state.history_pages += 1
+
+@st.fragment
+def show_history():
+    """Draw the latest pages of the chat history.
+
+    However long the conversation, a rerun draws at most history_pages
+    pages of messages. Showing an earlier page reruns only this fragment,
+    not the rest of the page.
+    """
+    messages = st.session_state.messages
+    hidden = 0
+    if CHAT_HISTORY_PAGE_SIZE > 0:
+        hidden = max(0, len(messages) - st.session_state.history_pages * CHAT_HISTORY_PAGE_SIZE)
+    if hidden:
+        st.button(f"Show earlier messages ({hidden} hidden)", key="show_earlier_messages",
+                  on_click=show_earlier_messages)
+    for message in messages[hidden:]:
+        with st.chat_message(message["role"], avatar=get_avatar(message["role"])):
+            st.markdown(message["content"])
 
 # Display existing chat messages
 with st.container():
-    for message in st.session_state.messages:
-        with st.chat_message(
-            message["role"],
-            avatar="src/images/1.png" if message["role"] == "assistant" else "src/images/chat_avatar.png"
-        ):
-            st.markdown(message["content"])
+    show_history()
 
 # Handle FAQ questions
 if st.session_state.faq_question:
     st.session_state.messages.append({"role": "user", "content": st.session_state.faq_question})
-    with st.chat_message("user", avatar="src/images/chat_avatar.png"):
+    with st.chat_message("user", avatar=get_avatar("user")):
         st.markdown(f"<p style='color: #0A2081;'>{st.session_state.faq_question}</p>", unsafe_allow_html=True)
     
-    with st.spinner("Generating response..."):  # Spinner starts here
-        response = generate_response(st.session_state.faq_question, LANGUAGE)
-    # Spinner ends here
-
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    with st.chat_message("assistant", avatar="src/images/1.png"):
-        st.markdown(response, unsafe_allow_html=True)
+    # FAQ answers are precomputed at build time; fall back to a live answer if missing
+    precomputed = get_precomputed_answer(st.session_state.faq_question, LANGUAGE)
+    if precomputed is not None:
+        with telemetry.trace("precomputed_answer", LANGUAGE) as trace:
+            with telemetry.span("render"), st.chat_message("assistant", avatar=get_avatar("assistant")):
+                st.markdown(precomputed, unsafe_allow_html=True)
+            remember(st.session_state.memory, st.session_state.faq_question, precomputed,
+                     get_script_run_ctx().session_id)
+        st.session_state.messages.append({"role": "assistant", "content": precomputed})
+        st.session_state.last_trace = trace.to_dict()
+    else:
+        respond(st.session_state.faq_question, LANGUAGE)
     
     st.session_state.faq_question = None
 
 # Handle user input
 if prompt := st.chat_input("What do you want to ask me?"):
     st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user", avatar="src/images/chat_avatar.png"):
+    with st.chat_message("user", avatar=get_avatar("user")):
         st.markdown(prompt)
     
-    with st.spinner("Generating response..."):  # Spinner starts here
-        response = generate_response(prompt, LANGUAGE)
-    # Spinner ends here
+    respond(prompt, LANGUAGE)
 
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    with st.chat_message("assistant", avatar="src/images/1.png"):
-        st.markdown(response, unsafe_allow_html=True)
+if SHOW_DEBUG_PANEL:
+    show_debug_panel()
 
 # Run about function if this is the main script
 if __name__ == '__main__':
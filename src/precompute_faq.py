@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import logging
+import argparse
+import resources
+from chroma import index_version
+from faq import LANGUAGES, constitution_faq, amendment_faq, FAQ_ANSWERS_PATH, artifact_matches
+from response_utils import MODEL, MAX_TOKENS, PROMPT_VERSION, build_messages, retrieval_target, add_structural_matches
+
+logging.basicConfig(level=logging.INFO)
+
+
+def artifact_is_current(path: str, current_index_version: str) -> bool:
+    """Check whether the artifact at path was built from this index and prompt"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return artifact_matches(artifact, current_index_version)
+
+
+def precompute_answer(question: str, language: str, results: dict) -> dict:
+    """Generate the answer for one FAQ question from its retrieval results"""
+    answer = resources.get_llm_client().complete_sync(
+        messages=build_messages(question, results, language),
+        model=MODEL,
+        max_tokens=MAX_TOKENS
+    )
+    return {
+        "answer": answer,
+        "retrieval": {
+            "ids": results.get("ids", [[]])[0],
+            "metadatas": results.get("metadatas", [[]])[0],
+            "distances": results.get("distances", [[]])[0]
+        }
+    }
+
+
+def precompute_faq_answers(path: str = FAQ_ANSWERS_PATH, force: bool = False) -> bool:
+    """Answer every FAQ x language pair and write the versioned artifact.
+
+    Returns False without doing anything when the existing artifact already
+    matches the current index and prompt versions, unless force is set.
+    """
+    current_index_version = index_version()
+    if not force and artifact_is_current(path, current_index_version):
+        logging.info("FAQ answers in %s are up to date (index %s, prompt %s)",
+                     path, current_index_version, PROMPT_VERSION)
+        return False
+
+    questions = constitution_faq + amendment_faq
+    answers = {}
+    for language in LANGUAGES:
+        answers[language] = {}
+        # Retrieve as a live answer would: vector search for this language's questions
+        # in one batch, with the passages of exact references ranked in
+        collection_name, where = retrieval_target(language)
+        batch = resources.get_chroma_client().query_collection_many(
+            collection_name=collection_name,
+            query_texts=questions,
+            where=where
+        )
+        retrievals = [add_structural_matches(question, language, results)
+                      for question, results in zip(questions, batch)]
+        for question, results in zip(questions, retrievals):
+            start = time.perf_counter()
+            answers[language][question] = precompute_answer(question, language, results)
+            logging.info("Answered FAQ in %s in %.2fs: %s", language, time.perf_counter() - start, question)
+
+    artifact = {
+        "index_version": current_index_version,
+        "manifest_version": resources.get_index_version(),
+        "prompt_version": PROMPT_VERSION,
+        "model": MODEL,
+        "embedding_model": resources.EMBEDDING_MODEL,
+        "unified_index": resources.UNIFIED_INDEX,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "answers": answers
+    }
+
+    # Write atomically so a running app never reads a half-written file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    logging.info("Wrote %d FAQ answers to %s", len(LANGUAGES) * len(questions), path)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute answers for the sidebar FAQ in every language")
+    parser.add_argument("--output", default=FAQ_ANSWERS_PATH, help="Path of the FAQ answers artifact")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the artifact is current")
+    args = parser.parse_args()
+    try:
+        precompute_faq_answers(path=args.output, force=args.force)
+    except Exception as e:
+        logging.error("FAQ precomputation failed: %s", str(e))
+        raise
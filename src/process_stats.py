@@ -0,0 +1,41 @@
+import os
+import resource
+
+# Process memory and disk usage figures for reports, health checks and benchmarks
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process, falling back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_resident_memory_bytes()
+
+
+def peak_resident_memory_bytes() -> int:
+    """Largest resident set size this process has reached"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def format_bytes(size: float) -> str:
+    """Human-readable size, e.g. "12.3 MiB" """
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
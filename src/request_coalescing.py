@@ -0,0 +1,127 @@
+import threading
+import contextvars
+from typing import Callable, Dict, Hashable, Iterator, List, Optional
+import telemetry
+
+
+class _Flight:
+    """One in-flight computation and the results its waiters share"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.chunks: List = []
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+
+
+class RequestCoalescer:
+    """Process-wide single-flight: concurrent calls with the same key share one computation.
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving while it is in flight (followers) wait for it and receive the
+    same result or exception. A key is forgotten as soon as its computation
+    finishes, so later calls compute afresh. Every follower is one saved
+    computation.
+    """
+
+    def __init__(self, name: str = "requests"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[tuple, _Flight] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def _join(self, mode: str, key: Hashable):
+        """Return the flight for key and whether the caller leads it"""
+        with self._lock:
+            flight = self._flights.get((mode, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(mode, key)] = _Flight()
+            self._stats["leaders" if leader else "followers"] += 1
+        telemetry.metrics.inc("constitution_coalesced_requests_total", coalescer=self.name, mode=mode,
+                              role="leader" if leader else "follower")
+        return flight, leader
+
+    def _land(self, mode: str, key: Hashable, flight: _Flight):
+        with self._lock:
+            if self._flights.get((mode, key)) is flight:
+                del self._flights[(mode, key)]
+        with flight.condition:
+            flight.done = True
+            flight.condition.notify_all()
+
+    def call(self, key: Hashable, fn: Callable, *args):
+        """Return fn(*args), or the result of an identical call already in flight"""
+        flight, leader = self._join("call", key)
+        if leader:
+            try:
+                flight.result = fn(*args)
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                self._land("call", key, flight)
+
+        with telemetry.span("coalesced_wait", coalescer=self.name):
+            with flight.condition:
+                while not flight.done:
+                    flight.condition.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key: Hashable, fn: Callable[..., Iterator], *args) -> Iterator:
+        """Iterate fn(*args), or replay and follow an identical stream already in flight.
+
+        The leader's stream is drained by a background thread into a buffer
+        that every caller reads from, so it runs to completion for the
+        followers even if the leader stops reading.
+        """
+        flight, leader = self._join("stream", key)
+        if leader:
+            # The thread keeps the caller's context, so its spans join the caller's trace
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._produce, key, flight, fn, args),
+                name=f"{self.name}-stream", daemon=True
+            ).start()
+            return self._follow(flight)
+        return self._follow_traced(flight)
+
+    def _produce(self, key: Hashable, flight: _Flight, fn: Callable[..., Iterator], args: tuple):
+        try:
+            for chunk in fn(*args):
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            self._land("stream", key, flight)
+
+    @staticmethod
+    def _follow(flight: _Flight) -> Iterator:
+        position = 0
+        while True:
+            with flight.condition:
+                while position == len(flight.chunks) and not flight.done:
+                    flight.condition.wait()
+                chunks = flight.chunks[position:]
+                done = flight.done
+            position += len(chunks)
+            yield from chunks
+            if done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def _follow_traced(self, flight: _Flight) -> Iterator:
+        with telemetry.span("coalesced_wait", coalescer=self.name):
+            yield from self._follow(flight)
+
+    def stats(self) -> dict:
+        """Calls that led a computation, calls that joined one (computations saved) and keys in flight"""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights))
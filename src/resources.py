@@ -0,0 +1,377 @@
+import os
+import time
+import hashlib
+import logging
+import importlib
+import threading
+from typing import Optional, TYPE_CHECKING
+from dotenv import load_dotenv
+from chroma_utils import EMBEDDING_MODEL as DEFAULT_EMBEDDING_MODEL, MULTILINGUAL_EMBEDDING_MODEL
+from structural_index import StructuralIndex
+from request_coalescing import RequestCoalescer
+from admission import (
+    AdmissionController, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_SECONDS
+)
+
+if TYPE_CHECKING:
+    from llm_client import AsyncLLMClient
+    from chroma_utils import ChromaDBClient
+    from answer_cache import SemanticAnswerCache
+
+# Streamlit re-executes main.py on every interaction, but imported modules stay
+# in sys.modules. Everything held here is therefore created once per server
+# process and shared by all sessions.
+#
+# chromadb, openai and sentence-transformers/torch take seconds to import, so
+# they are imported by the getters that need them rather than at module level.
+# main.py can then paint its first page while startup() runs in the background.
+
+load_dotenv()
+
+PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+
+# "chroma" serves the Chroma index directly; "memmap" serves the read-only
+# memory-mapped export written by `python src/vector_store.py`
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").lower()
+MEMMAP_STORE_DIRECTORY = os.getenv("MEMMAP_STORE_DIRECTORY", "./vector_store")
+
+# Search the single multilingual collection built by `chroma.py --unified`
+# instead of one collection per language. Without the language filter a
+# question can retrieve passages from every language's source text.
+UNIFIED_INDEX = os.getenv("UNIFIED_INDEX", "false").lower() == "true"
+UNIFIED_INDEX_LANGUAGE_FILTER = os.getenv("UNIFIED_INDEX_LANGUAGE_FILTER", "false").lower() == "true"
+
+EMBEDDING_MODEL = os.getenv(
+    "EMBEDDING_MODEL", MULTILINGUAL_EMBEDDING_MODEL if UNIFIED_INDEX else DEFAULT_EMBEDDING_MODEL
+)
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./.cache/answer_cache.sqlite3")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Modules imported up front by startup(), so their cost shows in the timings
+HEAVY_MODULES = ("numpy", "torch", "sentence_transformers", "chromadb", "openai", "httpx", "tiktoken")
+
+# Embedded and searched once at startup so the first user does not pay for lazy initialisation
+WARMUP_QUERY = "What are the fundamental rights provided by the Indian Constitution?"
+
+_lock = threading.RLock()
+_embedding_function = None
+_chroma_client: Optional["ChromaDBClient"] = None
+_llm_client: Optional["AsyncLLMClient"] = None
+_answer_cache: Optional["SemanticAnswerCache"] = None
+_structural_index: Optional[StructuralIndex] = None
+_request_coalescer: Optional[RequestCoalescer] = None
+_admission_controller: Optional[AdmissionController] = None
+_index_version: Optional[str] = None
+_started_at: Optional[float] = None
+_startup_timings: dict = {}
+_startup_thread: Optional[threading.Thread] = None
+_startup_error: Optional[Exception] = None
+_ready = threading.Event()
+
+
+def get_embedding_function():
+    """Return the shared sentence-transformer embedding function on the configured backend"""
+    global _embedding_function
+    if _embedding_function is None:
+        with _lock:
+            if _embedding_function is None:
+                from embedding_backends import BackendEmbeddingFunction, EMBEDDING_BACKEND
+                logging.info("Loading embedding model %s (%s backend)", EMBEDDING_MODEL, EMBEDDING_BACKEND)
+                _embedding_function = BackendEmbeddingFunction(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+    return _embedding_function
+
+
+def get_chroma_client() -> "ChromaDBClient":
+    """Return the shared ChromaDB client, or its memory-mapped stand-in when VECTOR_STORE=memmap"""
+    global _chroma_client
+    if _chroma_client is None:
+        with _lock:
+            if _chroma_client is None and VECTOR_STORE == "memmap":
+                from vector_store import MemmapVectorStoreClient
+                logging.info("Opening memory-mapped vector store at %s", MEMMAP_STORE_DIRECTORY)
+                _chroma_client = MemmapVectorStoreClient(
+                    persist_directory=MEMMAP_STORE_DIRECTORY,
+                    embedding_function=get_embedding_function(),
+                    model_name=EMBEDDING_MODEL
+                )
+            elif _chroma_client is None:
+                from chroma_utils import ChromaDBClient
+                logging.info("Opening ChromaDB at %s", PERSIST_DIRECTORY)
+                _chroma_client = ChromaDBClient(
+                    persist_directory=PERSIST_DIRECTORY,
+                    embedding_function=get_embedding_function(),
+                    model_name=EMBEDDING_MODEL
+                )
+    return _chroma_client
+
+
+def get_collection(collection_name: str):
+    """Return a cached collection handle, or None if the collection does not exist"""
+    try:
+        return get_chroma_client().get_collection(collection_name)
+    except Exception as e:
+        logging.error(f"Error getting collection {collection_name}: {str(e)}")
+        return None
+
+
+def get_llm_client() -> "AsyncLLMClient":
+    """Return the shared async chat client with pooled connections, deadlines and retries"""
+    global _llm_client
+    if _llm_client is None:
+        with _lock:
+            if _llm_client is None:
+                from llm_client import AsyncLLMClient
+                _llm_client = AsyncLLMClient()
+    return _llm_client
+
+
+def get_structural_index() -> StructuralIndex:
+    """Return the shared Article/Part/Schedule index"""
+    global _structural_index
+    if _structural_index is None:
+        with _lock:
+            if _structural_index is None:
+                _structural_index = StructuralIndex(PERSIST_DIRECTORY)
+    return _structural_index
+
+
+def get_index_version() -> str:
+    """Fingerprint of the built index: a hash of the build manifest chroma.py keeps next to it"""
+    global _index_version
+    if _index_version is None:
+        try:
+            with open(os.path.join(PERSIST_DIRECTORY, "manifest.json"), "rb") as f:
+                _index_version = hashlib.sha256(f.read()).hexdigest()[:16]
+        except OSError:
+            _index_version = "unversioned"
+    return _index_version
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """Return the process-wide coalescer that lets identical concurrent questions share one answer"""
+    global _request_coalescer
+    if _request_coalescer is None:
+        with _lock:
+            if _request_coalescer is None:
+                _request_coalescer = RequestCoalescer("answers")
+    return _request_coalescer
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the shared rate limiter and wait queue in front of the chat model"""
+    global _admission_controller
+    if _admission_controller is None:
+        with _lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController(
+                    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                    max_queue=ADMISSION_MAX_QUEUE,
+                    max_wait_seconds=ADMISSION_MAX_WAIT_SECONDS
+                )
+    return _admission_controller
+
+
+def get_answer_cache() -> "SemanticAnswerCache":
+    """Return the shared semantic answer cache"""
+    global _answer_cache
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                from answer_cache import SemanticAnswerCache
+                _answer_cache = SemanticAnswerCache(
+                    path=ANSWER_CACHE_PATH,
+                    similarity_threshold=ANSWER_CACHE_THRESHOLD,
+                    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                    ttl_seconds=ANSWER_CACHE_TTL_SECONDS
+                )
+    return _answer_cache
+
+
+def import_heavy_modules() -> dict:
+    """Import HEAVY_MODULES and return the seconds each took; already imported ones cost nothing"""
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.warning("Could not import %s: %s", name, str(e))
+        timings[f"import_{name}"] = time.perf_counter() - start
+    return timings
+
+
+def warmup() -> dict:
+    """Embed WARMUP_QUERY and search every collection the app queries.
+
+    The first encode and the first search of each collection do one-off
+    work (kernel selection, loading the vector index into memory) that
+    would otherwise land on the first user's request.
+    """
+    from faq import LANGUAGES
+    from response_utils import retrieval_target
+    from context_builder import get_encoding
+
+    timings = {}
+    chroma_client = get_chroma_client()
+    start = time.perf_counter()
+    query_embedding = chroma_client.embed_query(WARMUP_QUERY)
+    timings["warmup_embed"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for collection_name in sorted({retrieval_target(language)[0] for language in LANGUAGES}):
+        chroma_client.query_collection(collection_name, WARMUP_QUERY, n_results=1, query_embedding=query_embedding)
+    timings["warmup_search"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_encoding()
+    timings["tokenizer"] = time.perf_counter() - start
+    return timings
+
+
+def startup() -> dict:
+    """Load and warm up all shared resources; safe to call on every rerun.
+
+    Returns the cold-start timing breakdown in seconds on the call that did
+    the work and an empty dict afterwards; startup_timings() keeps it.
+    """
+    global _started_at, _startup_timings
+    if _started_at is not None:
+        return {}
+    with _lock:
+        if _started_at is not None:
+            return {}
+        began = time.perf_counter()
+        timings = import_heavy_modules()
+
+        start = time.perf_counter()
+        get_embedding_function()
+        timings["embedding_model"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_chroma_client()
+        timings["chroma_client"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_llm_client()
+        timings["llm_client"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_structural_index()
+        timings["structural_index"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_answer_cache()
+        timings["answer_cache"] = time.perf_counter() - start
+
+        timings.update(warmup())
+        timings["total"] = time.perf_counter() - began
+
+        _started_at = time.time()
+        _startup_timings = timings
+        _ready.set()
+        logging.info("Shared resources loaded: %s", {k: round(v, 3) for k, v in timings.items()})
+        return timings
+
+
+def _run_startup():
+    global _startup_error
+    try:
+        startup()
+    except Exception as e:
+        _startup_error = e
+        logging.error(f"Error loading shared resources: {str(e)}")
+    finally:
+        _ready.set()
+
+
+def start_background_startup():
+    """Run startup() in a background thread, once per process, and return immediately"""
+    global _startup_thread
+    if _startup_thread is not None or _started_at is not None:
+        return
+    with _lock:
+        if _startup_thread is None and _started_at is None:
+            _startup_thread = threading.Thread(target=_run_startup, name="resources-startup", daemon=True)
+            _startup_thread.start()
+
+
+def is_ready() -> bool:
+    """Whether startup has finished, successfully or not"""
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until startup has finished; starts it if nobody has yet"""
+    if _started_at is None and _startup_thread is None:
+        start_background_startup()
+    return _ready.wait(timeout)
+
+
+def startup_timings() -> dict:
+    """Cold-start timing breakdown of this process, in seconds"""
+    return dict(_startup_timings)
+
+
+def health_check() -> dict:
+    """Report whether each shared resource is loaded and usable"""
+    status = {
+        "started": _started_at is not None,
+        "uptime_seconds": time.time() - _started_at if _started_at else 0.0,
+        "startup_timings": startup_timings(),
+    }
+    if _startup_error is not None:
+        status["startup_error"] = str(_startup_error)
+    if _chroma_client is not None:
+        status["query_cache"] = _chroma_client.cache_info()
+    if _request_coalescer is not None:
+        status["request_coalescing"] = _request_coalescer.stats()
+    if _admission_controller is not None:
+        status["admission"] = _admission_controller.stats()
+    try:
+        get_embedding_function()(["health check"])
+        status["embedding_model"] = "ok"
+    except Exception as e:
+        status["embedding_model"] = f"error: {str(e)}"
+    try:
+        get_chroma_client().heartbeat()
+        status["chroma"] = "ok"
+    except Exception as e:
+        status["chroma"] = f"error: {str(e)}"
+    if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
+        status["llm_client"] = "ok" if _llm_client is not None else "not loaded"
+        if _llm_client is not None:
+            status["llm_retries"] = _llm_client.retries
+    else:
+        status["llm_client"] = "error: Azure OpenAI API Key or Endpoint not set"
+    status["healthy"] = all(
+        status[key] == "ok" for key in ("embedding_model", "chroma", "llm_client")
+    )
+    return status
+
+
+def reload() -> dict:
+    """Drop every shared resource and load them again, e.g. after an index rebuild"""
+    global _embedding_function, _chroma_client, _llm_client, _structural_index, _index_version
+    global _started_at, _startup_error
+    # faq imports this module, so it is imported here; its answers were checked against the old index
+    import faq
+    faq.reset_precomputed_answers()
+    with _lock:
+        if _llm_client is not None:
+            _llm_client.close()
+        _llm_client = None
+        _chroma_client = None
+        _structural_index = None
+        _index_version = None
+        _embedding_function = None
+        _started_at = None
+        _startup_error = None
+        try:
+            return startup()
+        except Exception as e:
+            _startup_error = e
+            raise
@@ -0,0 +1,401 @@
+import os
+import time
+import logging
+import unicodedata
+from typing import Callable, Hashable, Iterator, List, Optional, Tuple
+import resources
+import telemetry
+from admission import Overloaded
+from conversation_memory import ConversationMemory, MEMORY_SUMMARY_TOKENS
+from chroma_utils import language_target
+from structural_index import reference_fingerprint
+from context_builder import build_context, count_tokens
+
+MODEL = "gpt-4o"
+TEMPERATURE=0.7,
+MAX_TOKENS=500
+
+# Stream tokens into the chat as they arrive; set to "false" to wait for the full completion
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+# Serve answers to paraphrased questions from the semantic answer cache
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+
+# Let concurrent identical questions (e.g. many users clicking the same FAQ) share one answer
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+
+# Hold chat model requests back while the Azure RPM/TPM quota is used up instead of getting throttled
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+
+# Rewrite follow-up questions into standalone ones, using the conversation memory, before retrieval
+QUERY_REWRITE = os.getenv("QUERY_REWRITE", "true").lower() == "true"
+REWRITE_MAX_TOKENS = 100
+
+# Shown instead of an answer when a request is shed under load
+BUSY_MESSAGE = "The assistant is very busy right now. Please ask again in a minute."
+
+# Bump whenever system_prompt changes so cached answers are not reused across prompts
+PROMPT_VERSION = "2"
+
+# Create prompt for OpenAI
+system_prompt = """You are an expert on the Indian Constitution. Answer questions in {language}
+using only the following context. Include relevant citations from the context in your answer.
+
+Context:
+{context}
+
+Citations format:
+{citations}
+
+Make sure the answers are eloborate and factually correct.
+
+Please format your response with citations at the end, referencing specific sections and page numbers.
+"""
+
+
+def cache_namespace(language: str) -> str:
+    """Answer cache namespace for an output language, the current prompt, the embedding model and the index build"""
+    return (f"constitution_{language.lower()}@{PROMPT_VERSION}@{resources.EMBEDDING_MODEL}"
+            f"@{resources.get_index_version()}")
+
+
+def request_key(prompt: str, language: str) -> tuple:
+    """Coalescing key: the question ignoring case, spacing and closing punctuation, language and prompt version"""
+    question = " ".join(unicodedata.normalize("NFC", prompt).casefold().split()).rstrip("?!. ")
+    return question, language, PROMPT_VERSION
+
+
+def is_shareable(memory: Optional[ConversationMemory]) -> bool:
+    """Whether an answer may be shared with other sessions: not if it was shaped by a conversation's history"""
+    return memory is None or memory.is_empty()
+
+
+def retrieval_target(language: str) -> Tuple[str, Optional[dict]]:
+    """The collection to search for a language and the metadata filter to apply"""
+    return language_target(language, resources.UNIFIED_INDEX, resources.UNIFIED_INDEX_LANGUAGE_FILTER)
+
+
+def add_structural_matches(prompt: str, language: str, results: dict, n_results: int = 5) -> dict:
+    """Merge the passages of the prompt's exact references into its vector search results.
+
+    The provisions the structural index finds for references such as
+    "Article 21" are candidates, not answers: they are ranked by distance to
+    the query embedding together with the vector search hits, and the
+    n_results nearest are kept.
+    """
+    with telemetry.span("structural_lookup") as span:
+        entries = resources.get_structural_index().lookup(language, prompt)
+        span.set(matches=len(entries))
+    query_embeddings = results.get("query_embeddings")
+    found = set((results.get("ids") or [[]])[0])
+    ids = [entry["id"] for entry in entries if entry["id"] not in found]
+    if not ids or not query_embeddings:
+        return results
+
+    collection_name, _ = retrieval_target(language)
+    matches = resources.get_chroma_client().get_documents(collection_name, ids, query_embedding=query_embeddings[0])
+    fields = ("ids", "documents", "metadatas", "distances")
+    ranked = sorted(
+        list(zip(*((results.get(field) or [[]])[0] for field in fields)))
+        + list(zip(*(matches[field][0] for field in fields))),
+        key=lambda item: item[3]
+    )[:n_results]
+    merged = dict(results)
+    for position, field in enumerate(fields):
+        merged[field] = [[item[position] for item in ranked]]
+    return merged
+
+
+def retrieve(prompt: str, language: str, query_embedding: Optional[List[float]] = None,
+             n_results: int = 5) -> dict:
+    """Query the language collection for passages relevant to the prompt.
+
+    Passages for exact references such as "Article 21" or "the Ninth
+    Schedule" come from the structural index and compete with the vector
+    search hits on distance to the query.
+    """
+    with telemetry.span("retrieve"):
+        # Query ChromaDB for relevant context
+        collection_name, where = retrieval_target(language)
+        results = resources.get_chroma_client().query_collection(
+            collection_name=collection_name,
+            query_text=prompt,
+            n_results=n_results,
+            query_embedding=query_embedding,
+            where=where
+        )
+        return add_structural_matches(prompt, language, results, n_results)
+
+
+def build_messages(prompt: str, results: dict, language: str, memory: Optional[ConversationMemory] = None) -> list:
+    """Build the chat messages for the prompt from the retrieval results and the conversation memory"""
+    with telemetry.span("build_messages"):
+        # Prepare context from retrieved documents within the token budget
+        context, citations, _ = build_context(results)
+
+        return [
+            {"role": "system", "content": system_prompt.format(
+                language=language, context=context, citations=citations
+            )},
+            *(memory.messages() if memory is not None else []),
+            {"role": "user", "content": prompt}
+        ]
+
+
+def admit(messages: list, session_id: Optional[Hashable] = None,
+          on_queue: Optional[Callable[[Optional[int]], None]] = None, max_tokens: int = MAX_TOKENS) -> int:
+    """Wait until the chat model quota has room for messages; returns their prompt token count.
+
+    The request is charged its prompt tokens plus max_tokens, which is what
+    Azure counts against the tokens-per-minute quota. Raises Overloaded if
+    the request is shed.
+    """
+    prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+    telemetry.count_tokens("prompt", prompt_tokens)
+    if ADMISSION_CONTROL:
+        with telemetry.span("admission", tokens=prompt_tokens + max_tokens) as span:
+            waited = resources.get_admission_controller().acquire(session_id, prompt_tokens + max_tokens, on_queue)
+            span.set(waited_ms=round(waited * 1000, 1))
+    return prompt_tokens
+
+
+def complete(messages: list, max_tokens: int = MAX_TOKENS, session_id: Optional[Hashable] = None,
+             on_queue: Optional[Callable[[Optional[int]], None]] = None, stage: str = "llm") -> str:
+    """Admit and send one chat completion request, traced as stage; raises on failure"""
+    prompt_tokens = admit(messages, session_id, on_queue, max_tokens)
+
+    # The async client applies the deadline and retries
+    with telemetry.span(stage, model=MODEL, max_tokens=max_tokens, prompt_tokens=prompt_tokens) as span:
+        completion = resources.get_llm_client().complete_sync(
+            messages=messages,
+            model=MODEL,
+            max_tokens=max_tokens
+        )
+        completion_tokens = count_tokens(completion)
+        span.set(completion_tokens=completion_tokens)
+        telemetry.count_tokens("completion", completion_tokens)
+    return completion
+
+
+def rewrite_query(prompt: str, memory: Optional[ConversationMemory], session_id: Optional[Hashable] = None,
+                  on_queue: Optional[Callable[[Optional[int]], None]] = None) -> str:
+    """Turn a follow-up question into a standalone one using the conversation memory.
+
+    Returns prompt unchanged for the first question of a conversation, or
+    if the rewrite fails for any reason other than load shedding.
+    """
+    if not QUERY_REWRITE or memory is None or memory.is_empty():
+        return prompt
+    with telemetry.span("rewrite_query") as span:
+        try:
+            query = complete(memory.rewrite_messages(prompt), REWRITE_MAX_TOKENS, session_id, on_queue,
+                             stage="rewrite_llm").strip() or prompt
+        except Overloaded:
+            raise
+        except Exception as e:
+            span.fail(e)
+            logging.error(f"Error rewriting query: {str(e)}")
+            return prompt
+        span.set(rewritten=query != prompt)
+        return query
+
+
+def remember(memory: ConversationMemory, prompt: str, response: str, session_id: Optional[Hashable] = None):
+    """Add a question and its answer to memory, folding turns that leave the window into the summary.
+
+    Only completed answers belong in memory: callers skip turns that
+    generate_response or stream_response reported as failed.
+    """
+    evicted = memory.add_turn("user", prompt) + memory.add_turn("assistant", response)
+    if not evicted:
+        return
+    with telemetry.span("update_summary", turns=len(evicted)) as span:
+        try:
+            memory.summary = complete(memory.summary_messages(evicted), MEMORY_SUMMARY_TOKENS, session_id,
+                                      stage="summary_llm").strip()
+        except Exception as e:
+            # The evicted turns are lost, but the conversation goes on with the old summary
+            span.fail(e)
+            logging.error(f"Error updating conversation summary: {str(e)}")
+
+
+def lookup_cached_answer(prompt: str, language: str) -> Tuple[Optional[str], Optional[List[float]]]:
+    """Embed the prompt and look it up in the answer cache.
+
+    Returns the cached answer (or None) and the query embedding, which is
+    reused for retrieval and for storing the new answer on a miss.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+    with telemetry.span("answer_cache_lookup") as span:
+        query_embedding = resources.get_chroma_client().embed_query(prompt)
+        answer = resources.get_answer_cache().lookup(cache_namespace(language), query_embedding,
+                                                     reference_fingerprint(prompt))
+        span.set(hit=answer is not None)
+        telemetry.count_cache("answer", hit=answer is not None)
+    return answer, query_embedding
+
+
+def store_cached_answer(prompt: str, language: str, query_embedding: Optional[List[float]], answer: str):
+    """Add a freshly generated answer to the answer cache"""
+    if ANSWER_CACHE_ENABLED and query_embedding is not None and answer:
+        with telemetry.span("answer_cache_store"):
+            resources.get_answer_cache().store(cache_namespace(language), prompt, query_embedding, answer,
+                                               reference_fingerprint(prompt))
+
+
+def answer(prompt: str, language: str, session_id: Optional[Hashable] = None,
+           on_queue: Optional[Callable[[Optional[int]], None]] = None,
+           memory: Optional[ConversationMemory] = None, query: Optional[str] = None) -> str:
+    """Answer prompt from the answer cache or with a fresh LLM completion; raises on failure.
+
+    query, the standalone form of prompt, is what the answer cache and
+    retrieval see; it defaults to prompt. Answers that depend on a non-empty
+    memory are private to the session and skip the answer cache.
+    """
+    query = query or prompt
+    shareable = is_shareable(memory)
+    cached_answer, query_embedding = lookup_cached_answer(query, language) if shareable else (None, None)
+    if cached_answer is not None:
+        return cached_answer
+
+    results = retrieve(query, language, query_embedding)
+    messages = build_messages(prompt, results, language, memory)
+
+    # Get response from OpenAI
+    completion = complete(messages, MAX_TOKENS, session_id, on_queue)
+    if shareable:
+        store_cached_answer(query, language, query_embedding, completion)
+    return completion
+
+
+def stream_answer(prompt: str, language: str, session_id: Optional[Hashable] = None,
+                  on_queue: Optional[Callable[[Optional[int]], None]] = None,
+                  memory: Optional[ConversationMemory] = None, query: Optional[str] = None) -> Iterator[str]:
+    """Stream the answer to prompt: a cached answer in one piece, or LLM tokens as they arrive; raises on failure"""
+    query = query or prompt
+    shareable = is_shareable(memory)
+    cached_answer, query_embedding = lookup_cached_answer(query, language) if shareable else (None, None)
+    if cached_answer is not None:
+        yield cached_answer
+        return
+
+    results = retrieve(query, language, query_embedding)
+    messages = build_messages(prompt, results, language, memory)
+    prompt_tokens = admit(messages, session_id, on_queue)
+
+    with telemetry.span("llm", model=MODEL, max_tokens=MAX_TOKENS, prompt_tokens=prompt_tokens) as span:
+        stream = resources.get_llm_client().stream_sync(
+            messages=messages,
+            model=MODEL,
+            max_tokens=MAX_TOKENS
+        )
+
+        tokens = []
+        for token in stream:
+            if not tokens:
+                span.set(time_to_first_token_ms=round((time.perf_counter() - span.start) * 1000, 1))
+            tokens.append(token)
+            yield token
+
+        completion_tokens = count_tokens("".join(tokens))
+        span.set(completion_tokens=completion_tokens)
+        telemetry.count_tokens("completion", completion_tokens)
+
+    if shareable:
+        store_cached_answer(query, language, query_embedding, "".join(tokens))
+
+
+def generate_response(prompt: str, language: str, session_id: Optional[Hashable] = None,
+                      on_queue: Optional[Callable[[Optional[int]], None]] = None,
+                      memory: Optional[ConversationMemory] = None, outcome: Optional[dict] = None) -> str:
+    """Generate response using ChromaDB and OpenAI.
+
+    Concurrent calls for the same question share one computation. While the
+    request waits for chat model quota, on_queue is called with its queue
+    position (see AdmissionController.acquire); session_id keeps the queue
+    fair between sessions. If memory is given, the question is read as part
+    of that conversation; the caller records the exchange with remember().
+    Such answers are private to the session, so they are neither coalesced
+    nor cached. If an outcome dict is given, outcome["failed"] is set to
+    whether the request was shed or failed, so the response is a message
+    rather than an answer.
+    """
+    outcome = outcome if outcome is not None else {}
+    outcome["failed"] = False
+    with telemetry.trace("generate_response", language) as trace:
+        try:
+            query = rewrite_query(prompt, memory, session_id, on_queue)
+            if COALESCE_REQUESTS and is_shareable(memory):
+                return resources.get_request_coalescer().call(
+                    request_key(query, language), answer, prompt, language, session_id, on_queue, memory, query
+                )
+            return answer(prompt, language, session_id, on_queue, memory, query)
+
+        except Overloaded as e:
+            trace.fail(e)
+            outcome["failed"] = True
+            logging.warning(f"Request shed: {str(e)}")
+            return BUSY_MESSAGE
+
+        except Exception as e:
+            trace.fail(e)
+            outcome["failed"] = True
+            logging.error(f"Error generating response: {str(e)}")
+            return f"An error occurred: {str(e)}"
+
+
+def stream_response(prompt: str, language: str, timings: Optional[dict] = None,
+                    session_id: Optional[Hashable] = None,
+                    on_queue: Optional[Callable[[Optional[int]], None]] = None,
+                    memory: Optional[ConversationMemory] = None, outcome: Optional[dict] = None) -> Iterator[str]:
+    """Generate response using ChromaDB and OpenAI, yielding tokens as they arrive.
+
+    Concurrent calls for the same question share one stream; a caller that
+    joins late first receives the tokens streamed so far. If a timings dict
+    is given it is filled with time_to_first_token and total_latency, both
+    in seconds from the start of the call. session_id, on_queue, memory
+    and outcome are as for generate_response; on_queue may be called from
+    another thread. A stream that fails part way has already yielded some
+    of the answer before the error message, so check outcome rather than
+    the text.
+    """
+    timings = timings if timings is not None else {}
+    outcome = outcome if outcome is not None else {}
+    outcome["failed"] = False
+    start = time.perf_counter()
+    with telemetry.trace("stream_response", language) as trace:
+        try:
+            query = rewrite_query(prompt, memory, session_id, on_queue)
+            if COALESCE_REQUESTS and is_shareable(memory):
+                tokens = resources.get_request_coalescer().stream(
+                    request_key(query, language), stream_answer, prompt, language, session_id, on_queue, memory,
+                    query
+                )
+            else:
+                tokens = stream_answer(prompt, language, session_id, on_queue, memory, query)
+
+            for token in tokens:
+                if "time_to_first_token" not in timings:
+                    timings["time_to_first_token"] = time.perf_counter() - start
+                yield token
+
+        except Overloaded as e:
+            trace.fail(e)
+            outcome["failed"] = True
+            logging.warning(f"Request shed: {str(e)}")
+            yield BUSY_MESSAGE
+
+        except Exception as e:
+            trace.fail(e)
+            outcome["failed"] = True
+            logging.error(f"Error generating response: {str(e)}")
+            yield f"An error occurred: {str(e)}"
+
+        finally:
+            timings["total_latency"] = time.perf_counter() - start
+            logging.info(
+                "Streamed response: ttft=%.3fs total=%.3fs",
+                timings.get("time_to_first_token", timings["total_latency"]),
+                timings["total_latency"]
+            )
@@ -0,0 +1,30 @@
+import os
+import sys
+import logging
+import resources
+
+# Starts the Streamlit server only after shared resources are loaded and warmed
+# up, so the first request after a deploy is as fast as any other. Streamlit
+# runs main.py in this same process, and main.py then finds everything loaded.
+#
+#   python src/serve.py --server.port=5000 --server.address=0.0.0.0
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    try:
+        timings = resources.startup()
+        logging.info("Cold start breakdown (seconds):")
+        for phase, seconds in timings.items():
+            logging.info("  %-28s %7.3f", phase, seconds)
+    except Exception as e:
+        # Serve anyway; main.py retries loading on demand
+        logging.error(f"Startup failed: {str(e)}")
+
+    from streamlit.web import cli as stcli
+    sys.argv = ["streamlit", "run", os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"), *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import os
+import io
+import json
+import base64
+import hashlib
+import logging
+import argparse
+from typing import Dict, Optional
+
+# Images and CSS for the page chrome, prepared once at build time instead of on
+# every rerun. Images are recompressed (WebP, or optimised PNG if smaller) and
+# written to Streamlit's app static folder under content-hashed names, so they
+# are served as plain files the browser caches, and a changed image always gets
+# a new URL. The CSS gets the background image's static URL substituted in.
+# manifest.json maps each source name to its built file.
+#
+#   python src/static_assets.py            # build src/static/
+#   python src/static_assets.py --measure  # compare per-rerun payloads
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(SRC_DIR, "images")
+CSS_SOURCE = os.path.join(os.path.dirname(SRC_DIR), "styles.css")
+
+# Streamlit serves the "static" folder next to the main script at /app/static/
+# when server.enableStaticServing is on
+STATIC_DIR = os.path.join(SRC_DIR, "static")
+STATIC_URL = "/app/static/"
+MANIFEST_PATH = os.path.join(STATIC_DIR, "manifest.json")
+
+# The images the page uses
+IMAGES = ("BG.png", "1.png", "2.png", "3.png", "chat_avatar.png")
+
+# Lossy WebP quality for colour; alpha is kept lossless so logo and avatar edges stay sharp
+WEBP_QUALITY = int(os.getenv("ASSET_WEBP_QUALITY", "85"))
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def compress_image(path: str) -> tuple:
+    """Smallest encoding of the image at path; returns (data, extension)"""
+    from PIL import Image
+
+    with open(path, "rb") as f:
+        original = f.read()
+    image = Image.open(io.BytesIO(original))
+    candidates = [(original, "png")]
+    for options in ({"format": "WEBP", "quality": WEBP_QUALITY, "alpha_quality": 100, "method": 6},
+                    {"format": "PNG", "optimize": True}):
+        buffer = io.BytesIO()
+        image.save(buffer, **options)
+        candidates.append((buffer.getvalue(), options["format"].lower()))
+    return min(candidates, key=lambda candidate: len(candidate[0]))
+
+
+def source_fingerprint() -> str:
+    """Fingerprint of every source file and setting the build depends on"""
+    digest = hashlib.sha256(f"webp={WEBP_QUALITY}".encode())
+    for path in [os.path.join(IMAGES_DIR, name) for name in IMAGES] + [CSS_SOURCE]:
+        with open(path, "rb") as f:
+            digest.update(os.path.basename(path).encode() + f.read())
+    return digest.hexdigest()
+
+
+def build_assets(force: bool = False) -> dict:
+    """Build the static folder and its manifest; skipped if the sources have not changed"""
+    source = source_fingerprint()
+    manifest = load_manifest()
+    if manifest is not None and manifest.get("source") == source and not force:
+        logging.info("Static assets in %s are current", STATIC_DIR)
+        return manifest
+
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    files = {}
+    for name in IMAGES:
+        data, extension = compress_image(os.path.join(IMAGES_DIR, name))
+        files[name] = f"{os.path.splitext(name)[0]}.{fingerprint(data)}.{extension}"
+        with open(os.path.join(STATIC_DIR, files[name]), "wb") as f:
+            f.write(data)
+        logging.info("%s: %d -> %d bytes as %s", name, os.path.getsize(os.path.join(IMAGES_DIR, name)),
+                     len(data), files[name])
+
+    with open(CSS_SOURCE, encoding="utf-8") as f:
+        css = f.read().replace("data:image/png;base64,{bg_img}", STATIC_URL + files["BG.png"])
+    files["styles.css"] = f"styles.{fingerprint(css.encode())}.css"
+    with open(os.path.join(STATIC_DIR, files["styles.css"]), "w", encoding="utf-8") as f:
+        f.write(css)
+
+    # Files from earlier builds are no longer referenced
+    for name in os.listdir(STATIC_DIR):
+        if name not in files.values() and name != os.path.basename(MANIFEST_PATH):
+            os.remove(os.path.join(STATIC_DIR, name))
+
+    manifest = {"source": source, "files": files}
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info("Static assets written to %s", STATIC_DIR)
+    return manifest
+
+
+def load_manifest() -> Optional[dict]:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def page_assets(static: bool = True) -> Dict:
+    """Image sources and CSS for the page: static URLs if built, else inline data as before.
+
+    Returns {"images": {name: source}, "css": css}. An image source is a
+    URL, or a data URI if the assets are not built or static is False.
+    """
+    manifest = load_manifest() if static else None
+    if manifest is None:
+        if static:
+            logging.warning(f"No static assets in {STATIC_DIR}; inlining images. Run src/static_assets.py")
+        images = {}
+        for name in IMAGES:
+            with open(os.path.join(IMAGES_DIR, name), "rb") as f:
+                images[name] = f"data:image/png;base64,{base64.b64encode(f.read()).decode()}"
+        with open(CSS_SOURCE, encoding="utf-8") as f:
+            css = f.read().replace("data:image/png;base64,{bg_img}", images["BG.png"])
+        return {"images": images, "css": css}
+
+    files = manifest["files"]
+    with open(os.path.join(STATIC_DIR, files["styles.css"]), encoding="utf-8") as f:
+        css = f.read()
+    return {"images": {name: STATIC_URL + files[name] for name in IMAGES}, "css": css}
+
+
+def measure_rerun_payload(messages: int = 10) -> dict:
+    """Bytes main.py sends to the browser on one rerun, with inline and with static assets.
+
+    Runs main.py headless with a chat history of messages messages and sums
+    the serialized size of every message queued for the browser during a
+    rerun. Streamlit may swap large repeated messages for a reference to
+    the browser's copy, but it still builds, serializes and hashes them on
+    every rerun, and each new session downloads them once.
+    """
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+    from streamlit.testing.v1 import AppTest
+
+    original_enqueue = ForwardMsgQueue.enqueue
+    sent = {"bytes": 0}
+
+    def enqueue(self, msg):
+        sent["bytes"] += msg.ByteSize()
+        original_enqueue(self, msg)
+
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i}"} for i in range(messages)]
+    results = {}
+    ForwardMsgQueue.enqueue = enqueue
+    try:
+        for mode, static in (("inline", "false"), ("static", "true")):
+            os.environ["STATIC_ASSETS"] = static
+            app = AppTest.from_file(os.path.join(SRC_DIR, "main.py"), default_timeout=120)
+            app.session_state["messages"] = list(history)
+            app.run()
+            sent["bytes"] = 0
+            app.run()
+            results[mode] = sent["bytes"]
+    finally:
+        ForwardMsgQueue.enqueue = original_enqueue
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Compress and fingerprint the page's images and CSS into src/static/")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the sources have not changed")
+    parser.add_argument("--measure", action="store_true", help="Also report the bytes sent per rerun, before and after")
+    args = parser.parse_args()
+    build_assets(force=args.force)
+
+    if args.measure:
+        os.environ.setdefault("METRICS_PORT", "0")
+        # AppTest sessions created outside a script run warn about the missing context; see load_test.py
+        import streamlit.runtime.scriptrunner_utils.script_run_context as script_run_context
+        logging.getLogger(script_run_context.__name__).addFilter(
+            lambda record: "missing ScriptRunContext" not in record.getMessage()
+        )
+        payload = measure_rerun_payload()
+        logging.getLogger().setLevel(logging.INFO)
+        logging.info("Bytes sent per rerun: inline %d, static %d (%.1f%% less)", payload["inline"], payload["static"],
+                     100 * (1 - payload["static"] / payload["inline"]) if payload["inline"] else 0.0)
@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Maps Article numbers, Parts and Schedules to the chunks holding the headings
+# that define them, so the passages of exact references are always considered
+# alongside the vector search hits. Amendment Acts are recognised in questions
+# but not indexed: the text only cites them in footnotes, on dozens of chunks each.
+
+STRUCTURAL_INDEX_FILE = "structural_index.json"
+STRUCTURAL_INDEX_VERSION = 2
+
+KINDS = ("article", "part", "schedule")
+
+# Characters of the previous chunk searched with each chunk, for headings cut by a chunk boundary
+HEADING_CARRY = 300
+
+_UNITS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7, "eighth": 8,
+    "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13, "fourteenth": 14,
+    "fifteenth": 15, "sixteenth": 16, "seventeenth": 17, "eighteenth": 18, "nineteenth": 19,
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80,
+    "ninety": 90, "twentieth": 20, "thirtieth": 30, "fortieth": 40, "fiftieth": 50, "sixtieth": 60,
+    "seventieth": 70, "eightieth": 80, "ninetieth": 90,
+}
+_ORDINAL_WORD = (
+    r"(?:(?:one\s+)?hundred(?:th)?(?:\s+and)?[\s-]*)?"
+    r"(?:(?:" + "|".join(_TENS) + r")[\s-]*)?"
+    r"(?:" + "|".join(sorted(_UNITS, key=len, reverse=True)) + r")?"
+)
+
+# Headings as they appear in the extracted PDF text. An Article heading is its
+# number and title followed by ".—", as in "21. Protection of life and personal
+# liberty.—", possibly inside an amendment's "1[...]". The title may not run into
+# another numbered entry (the contents pages), a footnote citation or a page header.
+_NOT_TITLE = r"\s\d{1,3}[A-Z]{0,3}\.\s*[A-Z]|Constitution\s*\(|THE CONSTITUTION OF INDIA"
+_ARTICLE_HEADING = re.compile(
+    r"(?:^|[\s\[])(\d{1,3}[A-Z]{0,3})\.\s*(?:\d{1,2}\[)?"
+    r"(?!(?:Subs|Ins|Omitted|Added|Rep)\b|The words\b|THE CONSTITUTION OF INDIA)"
+    r"[A-Z](?:(?!" + _NOT_TITLE + r")[^—\[]){1,250}?\s*\.\s*—"
+)
+# "PART III FUNDAMENTAL RIGHTS", not the "(Part III.—Fundamental Rights)" page headers
+_PART_HEADING = re.compile(r"(?<![A-Za-z])PART\s+([IVXL]+[A-Z]?)\s+(?=(?:\d{1,2}\[)?[A-Z]{3})")
+# "SIXTH SCHEDULE [Articles 244(2) and 275(1)]", not the contents entry "SIXTH SCHEDULE—"
+_SCHEDULE_HEADING = re.compile(r"(" + "|".join(
+    ["FIRST", "SECOND", "THIRD", "FOURTH", "FIFTH", "SIXTH", "SEVENTH", "EIGHTH", "NINTH", "TENTH",
+     "ELEVENTH", "TWELFTH"]) + r")\s+SCHEDULE\s*[\[(]\s*Articles?\b")
+
+# References as users write them in questions
+_ARTICLE_NUMBER = r"\d{1,3}[A-Z]{0,3}\b"
+_ARTICLE_QUERY = re.compile(
+    r"\b(?:Articles?|Arts?\.)\s*(" + _ARTICLE_NUMBER + r"(?:\s*(?:,|&|\band\b|\bor\b)\s*" + _ARTICLE_NUMBER + r")*)",
+    re.IGNORECASE
+)
+# The letter of Parts such as IVA must be a capital, so "part in" is not Part I plus N
+_PART_QUERY = re.compile(r"\bPart\s+([IVXL]+(?-i:[A-Z])?|\d{1,2}(?-i:[A-Z])?)\b", re.IGNORECASE)
+_SCHEDULE_QUERY = re.compile(r"\b(" + _ORDINAL_WORD + r"|\d{1,2}(?:st|nd|rd|th))\s+Schedule\b", re.IGNORECASE)
+_AMENDMENT_QUERY = re.compile(
+    r"\b(\d{1,3}(?:st|nd|rd|th)|" + _ORDINAL_WORD + r")\s+(?:Constitutional\s+)?Amendment\b", re.IGNORECASE
+)
+
+
+def ordinal_to_int(text: str) -> Optional[int]:
+    """Parse "42nd", "Forty-second" or "One Hundred and First" into a number"""
+    text = text.strip().lower()
+    digits = re.match(r"^(\d+)(?:st|nd|rd|th)?$", text)
+    if digits:
+        return int(digits.group(1))
+    total = 0
+    for word in re.split(r"[\s-]+", text):
+        if word in ("and", ""):
+            continue
+        if word in ("hundred", "hundredth"):
+            total = max(total, 1) * 100
+        elif word in _TENS:
+            total += _TENS[word]
+        elif word in _UNITS:
+            total += _UNITS[word]
+        else:
+            return None
+    return total or None
+
+
+def _int_to_roman(number: int) -> str:
+    numerals = [(50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]
+    roman = ""
+    for value, numeral in numerals:
+        while number >= value:
+            roman += numeral
+            number -= value
+    return roman
+
+
+def _part_key(part: str) -> str:
+    """Canonical Part key: Roman numeral plus optional letter, e.g. "IVA" """
+    part = part.upper()
+    match = re.match(r"^(\d+)([A-Z]?)$", part)
+    if match:
+        return _int_to_roman(int(match.group(1))) + match.group(2)
+    return part
+
+
+def extract_structure(text: str) -> List[Tuple[str, str, int]]:
+    """Return the (kind, key, end) provision headings in a piece of constitution text, in text order"""
+    found = []
+    for match in _ARTICLE_HEADING.finditer(text):
+        found.append(("article", match.group(1), match.end()))
+    for match in _PART_HEADING.finditer(text):
+        found.append(("part", _part_key(match.group(1)), match.end()))
+    for match in _SCHEDULE_HEADING.finditer(text):
+        found.append(("schedule", str(ordinal_to_int(match.group(1))), match.end()))
+    return sorted(found, key=lambda heading: heading[2])
+
+
+def detect_references(question: str) -> List[Tuple[str, str]]:
+    """Return the (kind, key) structural references made in a question"""
+    found = []
+    for match in _ARTICLE_QUERY.finditer(question):
+        # "Articles 14, 19 and 21" names three Articles
+        for number in re.findall(_ARTICLE_NUMBER, match.group(1), re.IGNORECASE):
+            found.append(("article", number.upper()))
+    for match in _PART_QUERY.finditer(question):
+        found.append(("part", _part_key(match.group(1))))
+    for match in _SCHEDULE_QUERY.finditer(question):
+        number = ordinal_to_int(match.group(1))
+        if number:
+            found.append(("schedule", str(number)))
+    for match in _AMENDMENT_QUERY.finditer(question):
+        number = ordinal_to_int(match.group(1))
+        if number:
+            found.append(("amendment", str(number)))
+    return list(dict.fromkeys(found))
+
+
+def reference_fingerprint(question: str) -> str:
+    """The exact references and other numbers in a question, e.g. "article:21|amendment:42|#1950".
+
+    Questions that read almost the same but differ in these, such as
+    Article 21 and Article 22, are different questions.
+    """
+    references = [f"{kind}:{key}" for kind, key in sorted(detect_references(question))]
+    remainder = question
+    for pattern in (_ARTICLE_QUERY, _PART_QUERY, _SCHEDULE_QUERY, _AMENDMENT_QUERY):
+        remainder = pattern.sub(" ", remainder)
+    numbers = sorted({int(number) for number in re.findall(r"\d+", remainder)})
+    return "|".join(references + [f"#{number}" for number in numbers])
+
+
+def build_language_index(chunks: List[tuple], ids: List[str]) -> Dict[str, Dict[str, List[dict]]]:
+    """Build the structural index of one language from its chunks, in document order, and their IDs.
+
+    Article and Part headings count from the chunk holding the heading of
+    Article 1 up to the first Schedule, which skips the contents pages and
+    the numbered paragraphs and Parts inside the Schedules. A heading cut by
+    a chunk boundary belongs to the chunk it ends in.
+    """
+    index = {kind: {} for kind in KINDS}
+    section = "front"
+    carry = ""
+    for (text, meta), chunk_id in zip(chunks, ids):
+        joined = f"{carry} {text}"
+        headings = [heading for heading in extract_structure(joined) if heading[2] > len(carry) + 1]
+        if section == "front" and ("article", "1") in [heading[:2] for heading in headings]:
+            section = "articles"
+        for kind, key, _ in headings:
+            if kind == "schedule":
+                section = "schedules"
+            elif section != "articles":
+                continue
+            entries = index[kind].setdefault(key, [])
+            if not entries or entries[-1]["id"] != chunk_id:
+                entries.append({"id": chunk_id, "page_range": meta["page_range"]})
+        carry = text[-HEADING_CARRY:]
+    return index
+
+
+class StructuralIndex:
+    """Article/Part/Schedule lookup table persisted next to the Chroma index"""
+
+    def __init__(self, persist_directory: str = "./chroma_db"):
+        self.path = os.path.join(persist_directory, STRUCTURAL_INDEX_FILE)
+        self.languages = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == STRUCTURAL_INDEX_VERSION:
+                self.languages = data.get("languages", {})
+        except FileNotFoundError:
+            logging.warning("Structural index not found: %s", self.path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading structural index: {str(e)}")
+
+    def set_language(self, language: str, index: Dict[str, Dict[str, List[dict]]]):
+        """Replace the index of one language"""
+        with self._lock:
+            self.languages[language] = index
+
+    def save(self):
+        """Write the index atomically"""
+        with self._lock:
+            data = {"version": STRUCTURAL_INDEX_VERSION, "languages": self.languages}
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def lookup(self, language: str, question: str, limit: int = 20) -> List[dict]:
+        """Chunks holding the provisions a question refers to, as candidates for ranking.
+
+        They are in document order, not order of relevance: callers rank
+        them against the question. Returns an empty list when the question
+        makes no structural reference or none of its references are in the
+        index.
+        """
+        index = self.languages.get(language)
+        if not index:
+            return []
+        references = detect_references(question)
+        if not references:
+            return []
+
+        # Share the limit across references so "Articles 14 and 21" gets both
+        per_reference = max(1, limit // len(references))
+        entries = []
+        for kind, key in references:
+            entries.extend(index.get(kind, {}).get(key, [])[:per_reference])
+        return list({entry["id"]: entry for entry in entries}.values())[:limit]
@@ -0,0 +1,165 @@
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# A local stand-in for the Azure OpenAI chat completions endpoint. Answers are
+# deterministic functions of the question, latency is tunable, and throttling
+# can be injected to exercise the client's retry behaviour.
+
+_PATH = re.compile(r"^/openai/deployments/([^/]+)/chat/completions")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Fake Azure chat endpoint.
+
+    first_token_latency is the delay before the first token (or the whole
+    response when not streaming), token_latency the delay between streamed
+    tokens. The first fail_first requests get a 429 with the given
+    Retry-After header.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_latency: float = 0.2,
+                 token_latency: float = 0.01, answer_tokens: int = 50, fail_first: int = 0,
+                 retry_after: Optional[float] = 1.0):
+        super().__init__((host, port), _StubHandler)
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def next_request(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def answer_for(self, messages: list, max_tokens: int) -> list:
+        """Deterministic answer tokens for the last user message"""
+        question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        words = f"Stub answer to: {question}".split()
+        count = min(self.answer_tokens, max_tokens or self.answer_tokens)
+        return [(words[i % len(words)] if words else "token") + " " for i in range(count)]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: StubLLMServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug("stub llm: " + format, *args)
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        match = _PATH.match(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not match:
+            self._send_json(404, {"error": {"code": "404", "message": "Resource not found"}})
+            return
+
+        number = self.server.next_request()
+        if number <= self.server.fail_first:
+            headers = {}
+            if self.server.retry_after is not None:
+                headers["Retry-After"] = str(self.server.retry_after)
+            self._send_json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, headers)
+            return
+
+        model = match.group(1)
+        tokens = self.server.answer_for(request.get("messages", []), request.get("max_tokens"))
+        created = int(time.time())
+        completion_id = f"chatcmpl-stub-{number}"
+        time.sleep(self.server.first_token_latency)
+
+        if not request.get("stream"):
+            time.sleep(self.server.token_latency * max(0, len(tokens) - 1))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(data: str):
+            payload = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.server.token_latency)
+                send_event(json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                }))
+            send_event(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. a user navigated away mid-answer
+            self.close_connection = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake of the Azure OpenAI chat endpoint")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer this many requests with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = StubLLMServer(
+        port=args.port, first_token_latency=args.first_token_latency, token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens, fail_first=args.fail_first, retry_after=args.retry_after
+    )
+    logging.info("Stub LLM listening on %s; set AZURE_OPENAI_ENDPOINT to this URL", server.url)
+    server.serve_forever()
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Tracing spans and Prometheus-style metrics for the answer path, stdlib only.
+#
+# span() times one stage. Spans opened while another is active become its
+# children, so a request traced with trace() yields a tree such as
+# generate_response > retrieve > query_collection > embed_queries. Every
+# span also feeds the stage latency histogram, whether or not a trace is
+# active. When the outermost trace ends it is logged as one JSON line and
+# kept as last_trace().
+#
+# start_metrics_server() serves the metrics on /metrics in the text format
+# Prometheus scrapes.
+
+# The metrics server is opt-in and local by default; set METRICS_HOST=0.0.0.0 to let a remote Prometheus scrape it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the metrics server, e.g. 9464 turns it on
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS = {
+    "constitution_requests_total": ("counter", "Answer requests by operation, language and outcome"),
+    "constitution_request_duration_seconds": ("histogram", "Answer request latency by operation"),
+    "constitution_stage_duration_seconds": ("histogram", "Latency of each traced stage"),
+    "constitution_stage_errors_total": ("counter", "Errors raised or reported by each traced stage"),
+    "constitution_tokens_total": ("counter", "Chat model tokens by kind (prompt or completion)"),
+    "constitution_cache_total": ("counter", "Cache lookups by cache and result (hit or miss)"),
+    "constitution_admission_total": ("counter", "Chat model requests admitted or shed (queue_full, timed_out)"),
+    "constitution_admission_wait_seconds": ("histogram", "Time admitted requests waited for chat model quota"),
+    "constitution_coalesced_requests_total": (
+        "counter", "Requests that led a computation or joined an identical one in flight (a saved call)"
+    ),
+}
+
+
+class Metrics:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, list] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Add one observation to a histogram"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts, then the +Inf bucket, the sum and the count
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """Current value of a counter, or the observation count of a histogram"""
+        key = self._key(name, labels)
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            return self._histograms[key][-1] if key in self._histograms else 0.0
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _labels(labels: tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = [f'{key}="{value}"' for key, value in labels + extra]
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+
+        lines, described = [], set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {METRICS.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{self._labels(labels)} {value:g}")
+        for (name, labels), values in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{self._labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {values[-2]:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Span:
+    """One timed stage with attributes, an optional error and child spans"""
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.request = False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: Exception):
+        """Record an error that the traced code handles itself"""
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self, origin: Optional[float] = None) -> dict:
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# The outermost trace in progress; traces nested in it are not counted as requests again
+_current_request: ContextVar[Optional[Span]] = ContextVar("current_request", default=None)
+_last_trace: Optional[dict] = None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time a stage, nesting it under the active span if there is one"""
+    current = Span(name, attributes)
+    parent = _current_span.get()
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            current.fail(e)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A generator finalized in another context than the one it started in
+            _current_span.set(parent)
+        current.duration = time.perf_counter() - current.start
+        metrics.observe("constitution_stage_duration_seconds", current.duration, stage=name)
+        if current.error is not None:
+            metrics.inc("constitution_stage_errors_total", stage=name)
+        if parent is None:
+            _finish_trace(current)
+
+
+@contextmanager
+def trace(operation: str, language: str = "", **attributes) -> Iterator[Span]:
+    """Trace one answer request: a span that also feeds the request rate and latency metrics.
+
+    A trace opened inside another one, e.g. generate_response inside the
+    app's respond, is an ordinary span and is not counted a second time.
+    """
+    with span(operation, language=language, **attributes) as current:
+        current.request = True
+        outermost = _current_request.get() is None
+        token = _current_request.set(current) if outermost else None
+        try:
+            yield current
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                current.fail(e)
+            raise
+        finally:
+            if outermost:
+                try:
+                    _current_request.reset(token)
+                except ValueError:
+                    _current_request.set(None)
+                current.duration = time.perf_counter() - current.start
+                metrics.observe("constitution_request_duration_seconds", current.duration, operation=operation)
+                metrics.inc("constitution_requests_total", operation=operation, language=language,
+                            outcome="error" if current.error is not None else "ok")
+
+
+def _finish_trace(root: Span):
+    global _last_trace
+    if not root.request:
+        # A stage outside any request; its latency is already in the histogram
+        return
+    _last_trace = root.to_dict()
+    logging.info("trace %s", json.dumps(_last_trace, ensure_ascii=False, default=str))
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def last_trace() -> Optional[dict]:
+    """The most recently finished trace in this process"""
+    return _last_trace
+
+
+def count_cache(cache: str, hit: bool, count: int = 1):
+    if count:
+        metrics.inc("constitution_cache_total", count, cache=cache, result="hit" if hit else "miss")
+
+
+def count_tokens(kind: str, tokens: int):
+    metrics.inc("constitution_tokens_total", tokens, kind=kind)
+
+
+def flatten(trace_dict: dict, depth: int = 0) -> List[dict]:
+    """Rows of (depth, stage, start, duration, attributes) for displaying a trace as a table"""
+    # Indent with em spaces, which table cells do not collapse
+    rows = [{
+        "stage": "\u2003" * depth + trace_dict["name"],
+        "start_ms": trace_dict["start_ms"],
+        "duration_ms": trace_dict["duration_ms"],
+        "details": ", ".join(f"{key}={value}" for key, value in trace_dict["attributes"].items())
+                   + (f" error={trace_dict['error']}" if trace_dict["error"] else ""),
+    }]
+    for child in trace_dict["children"]:
+        rows.extend(flatten(child, depth + 1))
+    return rows
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+_server_failed = False
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a background thread, once per process; port 0 disables it.
+
+    If the port cannot be bound the error is logged once and later calls,
+    such as on every Streamlit rerun, do not try again.
+    """
+    global _server, _server_failed
+    if not port or _server_failed:
+        return None
+    with _server_lock:
+        if _server is None and not _server_failed:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+                _server.daemon_threads = True
+            except OSError as e:
+                _server_failed = True
+                logging.error(f"Error starting metrics server: {str(e)}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logging.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return _server
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+from typing import List, Optional
+import numpy as np
+import telemetry
+from chroma_utils import ChromaDBClient, EMBEDDING_MODEL
+
+# A read-only alternative to the Chroma index for small corpora. Each
+# collection is a directory of flat files: unit-length float16 vectors and
+# UTF-8 document text are memory-mapped, so worker processes share one
+# page-cached copy, and queries are answered by exact brute-force search.
+
+MEMMAP_STORE_DIRECTORY = "./vector_store"
+STORE_FORMAT_VERSION = 1
+
+VECTORS_FILE = "vectors.npy"
+OFFSETS_FILE = "offsets.npy"
+DOCUMENTS_FILE = "documents.bin"
+RECORDS_FILE = "records.json"
+
+
+class ReadOnlyStoreError(PermissionError):
+    """Raised on writes to the memory-mapped store, which can only be rebuilt by exporting"""
+
+
+def _matches(meta: dict, where: Optional[dict]) -> bool:
+    """Evaluate a Chroma where filter: plain equality, $eq, $ne, $in, $nin, $and and $or"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(meta, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(meta, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            for operator, value in condition.items():
+                if operator == "$eq" and meta.get(key) != value:
+                    return False
+                if operator == "$ne" and meta.get(key) == value:
+                    return False
+                if operator == "$in" and meta.get(key) not in value:
+                    return False
+                if operator == "$nin" and meta.get(key) in value:
+                    return False
+                if operator not in ("$eq", "$ne", "$in", "$nin"):
+                    raise ValueError(f"Unsupported where operator: {operator}")
+        elif meta.get(key) != condition:
+            return False
+    return True
+
+
+class MemmapCollection:
+    """Read-only collection answering the query/get/count calls ChromaDBClient makes on a Chroma collection.
+
+    Distances are cosine distances (1 - cosine), which is what the Chroma
+    collections return: they are built in the cosine space of the
+    sentence-transformers embedding function.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        with open(os.path.join(path, RECORDS_FILE), encoding="utf-8") as f:
+            records = json.load(f)
+        if records.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"{path} was exported with store format {records.get('version')}, "
+                             f"expected {STORE_FORMAT_VERSION}")
+        self.model_name = records["model_name"]
+        self.ids = records["ids"]
+        self.metadatas = records["metadatas"]
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self.documents = np.memmap(os.path.join(path, DOCUMENTS_FILE), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def document(self, position: int) -> str:
+        return bytes(self.documents[self.offsets[position]:self.offsets[position + 1]]).decode("utf-8")
+
+    def _candidates(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        return np.array([i for i, meta in enumerate(self.metadatas) if _matches(meta, where)], dtype=np.int64)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Optional[dict] = None,
+              **kwargs) -> dict:
+        """Exact top-n_results search for each query embedding"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        candidates = self._candidates(where)
+        vectors = self.vectors if candidates is None else self.vectors[candidates]
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if len(vectors) == 0:
+            for field in results:
+                results[field] = [[] for _ in queries]
+            return results
+
+        scores = queries @ np.asarray(vectors, dtype=np.float32).T
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, columns in enumerate(top):
+            columns = columns[np.argsort(-scores[row, columns], kind="stable")]
+            positions = columns if candidates is None else candidates[columns]
+            results["ids"].append([self.ids[i] for i in positions])
+            results["documents"].append([self.document(i) for i in positions])
+            results["metadatas"].append([self.metadatas[i] for i in positions])
+            results["distances"].append([float(1 - scores[row, c]) for c in columns])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None, **kwargs) -> dict:
+        """Records by ID and/or metadata filter"""
+        include = ["documents", "metadatas"] if include is None else include
+        if ids is not None:
+            positions = [self._positions[doc_id] for doc_id in ids if doc_id in self._positions]
+        else:
+            positions = range(len(self.ids))
+        positions = [i for i in positions if _matches(self.metadatas[i], where)][:limit]
+        return {
+            "ids": [self.ids[i] for i in positions],
+            "documents": [self.document(i) for i in positions] if "documents" in include else None,
+            "metadatas": [self.metadatas[i] for i in positions] if "metadatas" in include else None,
+            "embeddings": np.asarray(self.vectors[positions], dtype=np.float32) if "embeddings" in include else None,
+        }
+
+
+class MemmapVectorStoreClient(ChromaDBClient):
+    """ChromaDBClient over memory-mapped collections exported by this module.
+
+    Opening it maps files instead of starting Chroma's SQLite and HNSW
+    segments. It is read-only: build the Chroma index with chroma.py, then
+    export it.
+    """
+
+    def __init__(self, persist_directory: str = MEMMAP_STORE_DIRECTORY, embedding_function=None,
+                 model_name: str = EMBEDDING_MODEL, backend: Optional[str] = None):
+        self.persist_directory = persist_directory
+        self.client = None
+        self.model_name = model_name
+        if embedding_function is None:
+            from embedding_backends import BackendEmbeddingFunction, EMBEDDING_BACKEND
+            embedding_function = BackendEmbeddingFunction(model_name, backend or EMBEDDING_BACKEND)
+        self.embedding_function = embedding_function
+        self._init_caches()
+
+    def get_collection(self, collection_name: str) -> MemmapCollection:
+        """Return the mapped collection, opening it on first use"""
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                self._cache_stats["collection_hits"] += 1
+                telemetry.count_cache("collection", hit=True)
+                return collection
+            self._cache_stats["collection_misses"] += 1
+        telemetry.count_cache("collection", hit=False)
+
+        path = os.path.join(self.persist_directory, collection_name)
+        if not os.path.isdir(path):
+            raise ValueError(f"Collection {collection_name} does not exist in {self.persist_directory}")
+        with telemetry.span("open_collection", collection=collection_name):
+            collection = MemmapCollection(path)
+        if collection.model_name != self.model_name:
+            raise ValueError(f"Collection {collection_name} was embedded with {collection.model_name}, "
+                             f"not {self.model_name}")
+        with self._lock:
+            self._collections[collection_name] = collection
+        return collection
+
+    def heartbeat(self) -> int:
+        if not os.path.isdir(self.persist_directory):
+            raise FileNotFoundError(f"Vector store not found: {self.persist_directory}")
+        return time.time_ns()
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyStoreError("The memory-mapped vector store is read-only; rebuild with chroma.py and export")
+
+    create_collection = add_documents = update_metadata = delete_documents = _read_only
+
+
+def export_collection(collection, output_dir: str) -> int:
+    """Write one Chroma collection as memory-mappable files; returns the number of records"""
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    if data["ids"]:
+        vectors = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+    else:
+        # An empty collection has no vectors to take the dimension from; queries on it return nothing
+        logging.warning("Collection %s is empty", collection.name)
+        vectors = np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = (vectors / np.where(norms == 0, 1, norms)).astype(np.float16)
+
+    encoded = [(document or "").encode("utf-8") for document in data["documents"]]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(document) for document in encoded])
+    embedding_function = (collection.configuration_json or {}).get("embedding_function") or {}
+
+    # Write next to the target and swap it in, so readers never see a partial export
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, VECTORS_FILE), vectors)
+    np.save(os.path.join(tmp_dir, OFFSETS_FILE), offsets)
+    with open(os.path.join(tmp_dir, DOCUMENTS_FILE), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(tmp_dir, RECORDS_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": STORE_FORMAT_VERSION,
+            "model_name": embedding_function.get("config", {}).get("model_name", EMBEDDING_MODEL),
+            "ids": data["ids"],
+            "metadatas": data["metadatas"]
+        }, f, ensure_ascii=False)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return len(data["ids"])
+
+
+def export_chroma_db(persist_directory: str = "./chroma_db", output_directory: str = MEMMAP_STORE_DIRECTORY,
+                     collection_names: Optional[List[str]] = None):
+    """Export Chroma collections (all of them by default) to the memory-mapped store"""
+    import chromadb
+    from chromadb.config import Settings
+
+    # Listing collections does not instantiate their embedding functions
+    client = chromadb.PersistentClient(path=persist_directory, settings=Settings(anonymized_telemetry=False))
+    os.makedirs(output_directory, exist_ok=True)
+    for collection in client.list_collections():
+        if collection_names and collection.name not in collection_names:
+            continue
+        start = time.perf_counter()
+        count = export_collection(collection, os.path.join(output_directory, collection.name))
+        logging.info("Exported %s: %d records in %.2fs", collection.name, count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the Chroma index to the memory-mapped vector store")
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="Chroma persist directory to read")
+    parser.add_argument("--output", default=MEMMAP_STORE_DIRECTORY, help="Directory of the memory-mapped store")
+    parser.add_argument("collections", nargs="*", help="Collections to export (default: all)")
+    args = parser.parse_args()
+    export_chroma_db(args.chroma_dir, args.output, args.collections)